@@ -0,0 +1,30 @@
+#Shared fixtures: the calibration cache and the attenuation store go to a temporary folder, never to data/ of the repo
+import os
+import sys
+import tempfile
+
+DATA_DIR=tempfile.mkdtemp(prefix='xct_tests_')
+os.environ['XCT_DATA_DIR']=DATA_DIR          # read by xct_database when it is first imported
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import pytest
+import xct_engine as xct
+import xct_database
+
+PHASES=('Quartz','Calcite','Pyrite')
+
+def attenuationTable(energies=np.round(np.geomspace(10,200,60),2)):
+    ########### photoelectric (E^-3) + Compton attenuation for the filters and a few phases, fixed values
+    names=list(dict.fromkeys(xct.FILTERS+PHASES))          # Quartz is a filter and a phase
+    photoelectric=np.linspace(0.5,300,len(names))
+    compton=np.linspace(0.15,0.5,len(names))
+    mu=photoelectric[None,:]*(energies[:,None]/30)**-3+compton[None,:]*(energies[:,None]/30)**-0.3
+    return pd.concat([pd.DataFrame({xct_database.ENERGY:energies}),pd.DataFrame(mu,columns=names)],axis=1)
+
+@pytest.fixture(scope='session')
+def database():
+    ########### the local store the app and the API read, backed by a memory map as in production
+    xct_database.writeStore(attenuationTable(),DATA_DIR,source='tests')
+    return xct_database.loadStore(DATA_DIR)
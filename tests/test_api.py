@@ -0,0 +1,62 @@
+#Planning API: invalid plans and requests are answered with an error (HTTP 400), never a crash, a truncated value or a hung connection
+import json
+import socket
+import threading
+import pytest
+import xct_api
+
+@pytest.mark.parametrize('values',[{'phases':[[1]],'fractions':[0.5]},{'phases':[1],'fractions':[0.5]},{'phases':['Unknown'],'fractions':[0.5]},
+                                   {'diameter':'x'},{'diameter':-1},{'binning':'9x'},{'phases':['Quartz'],'fractions':[0.7,0.2]},
+                                   {'phases':['Quartz','Calcite'],'fractions':[0.7,0.5]},{'unknown':1},
+                                   {'numberOfScans':2.7},{'numberOfScans':True},{'numberOfScans':'two'},{'numberOfScans':'1.5'},
+                                   {'numberOfScans':float('inf')},{'numberOfScans':0}])
+def test_apiRejectsInvalidPlans(database,values):
+    with pytest.raises(ValueError):
+        xct_api.Planner(database).plan(values)
+
+def test_apiAcceptsWholeNumbersOfScans(database):
+    planner=xct_api.Planner(database)
+    assert [json.loads(planner.plan({'numberOfScans':scans}))['numberOfScans'] for scans in (3,3.0,'3')]==[3,3,3]
+
+def test_apiCanonicalPlansShareOneAnswer(database):
+    planner=xct_api.Planner(database)
+    first=planner.plan({'diameter':20,'phases':['Quartz','Calcite'],'fractions':[0.6,0.3]})
+    second=planner.plan({'diameter':'20','phases':'Calcite,Quartz,Pyrite','fractions':'0.3,0.6,0'})
+    assert first==second
+    assert planner.answer.cache_info().hits==1
+    answer=json.loads(first)
+    assert answer['voxelSize']==21 and answer['phases']==['Calcite','Quartz'] and 0<answer['transmissionAtEmax']<100
+
+def test_apiBatchKeepsGoingAfterAnInvalidPlan(database):
+    results=json.loads(xct_api.Planner(database).plans([{'diameter':5},{'phases':[[1]],'fractions':[0.5]},[1]]))['results']
+    assert results[0]['voxelSize']>=1
+    assert 'error' in results[1] and 'error' in results[2]
+
+@pytest.fixture
+def server(database):
+    server=xct_api.makeServer(port=0,database=database)
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+def rawRequest(address,request):
+    ########### whole answer of the server until it closes the connection
+    with socket.create_connection(address,timeout=10) as connection:
+        connection.sendall(request)
+        answer=b''
+        while True:
+            data=connection.recv(65536)
+            if not data:
+                return answer
+            answer+=data
+
+@pytest.mark.parametrize('length',[b'abc',b'-1'])
+def test_apiRejectsInvalidContentLength(server,length):
+    answer=rawRequest(server,b'POST /plan HTTP/1.1\r\nHost: test\r\nContent-Length: '+length+b'\r\n\r\n{}')
+    assert answer.startswith(b'HTTP/1.1 400') and b'Content-Length' in answer
+
+def test_apiAnswersPostedPlans(server):
+    body=json.dumps({'diameter':20}).encode()
+    answer=rawRequest(server,b'POST /plan HTTP/1.1\r\nHost: test\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s'%(len(body),body))
+    assert answer.startswith(b'HTTP/1.1 200') and json.loads(answer.split(b'\r\n\r\n',1)[1])['voxelSize']==21
@@ -0,0 +1,21 @@
+#Reruns of the whole streamlit app with AppTest, on the attenuation store of the tests (no network access)
+import os
+import pytest
+
+AppTest=pytest.importorskip('streamlit.testing.v1').AppTest
+APP=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'xct_explorer_expert_270824.py')
+
+@pytest.fixture
+def app(database):
+    return AppTest.from_file(APP,default_timeout=120).run()
+
+def test_appRunsWithTheDefaults(app):
+    assert not app.exception
+    assert [tab.label for tab in app.tabs][-1]=='Preview'
+
+@pytest.mark.parametrize('diameter',[0,1])
+def test_appRunsForTheSmallestDiameters(app,diameter):
+    ########### the calibration lines give voxel sizes of 0 um or below there
+    app.slider[0].set_value(diameter).run()
+    assert not app.exception
+    assert app.sidebar.get('metric')[0].value=='1'
@@ -0,0 +1,43 @@
+#Batch manifests: invalid rows must raise ValueError (shown by the app), never crash or give nan plans
+import io
+import pytest
+import xct_batch
+
+def planCsv(text,database):
+    return xct_batch.planManifest(xct_batch.readManifest(io.StringIO(text)),database,'2x','1920','Fe',0.05,160)
+
+def test_manifestExamplePlans(database):
+    schedule=xct_batch.planManifest(xct_batch.MANIFEST_EXAMPLE,database,'2x','1920','Fe',0.05,160)
+    assert schedule['Voxel Size (um)'].tolist()==[21,7]
+    assert schedule['Transmission at Emax (%)'].notna().all()
+
+@pytest.mark.parametrize('rows,message',[
+    ('a,10,Quartz,0.5\nb,,Quartz,0.5\nc,abc,Quartz,0.5\n','diameter missing, not a number or not positive: row 2 (b), row 3 (c)'),
+    ('a,10,Quartz,-0.1\nb,10,Quartz,x\n','fraction missing, not a number or negative: row 1 (a), row 2 (b)'),
+    ('a,10,Quartz,1.5\n','fractions adding up to more than 1: row 1 (a)'),
+])
+def test_manifestRejectsInvalidRows(database,rows,message):
+    with pytest.raises(ValueError,match=message.replace('(','\\(').replace(')','\\)')):
+        planCsv('Sample,Diameter (mm),Phase1,Fraction1\n'+rows,database)
+
+@pytest.mark.parametrize('rows,message',[
+    ('a,10,two,Quartz,0.5\nb,10,1.5,Quartz,0.5\nc,10,2,Quartz,0.5\n','number of scans not a whole number: row 1 (a), row 2 (b)'),
+    ('a,10,0,Quartz,0.5\nb,10,-2,Quartz,0.5\n','number of scans below 1: row 1 (a), row 2 (b)'),
+])
+def test_manifestRejectsInvalidNumberOfScans(database,rows,message):
+    with pytest.raises(ValueError,match=message.replace('(','\\(').replace(')','\\)')):
+        planCsv('Sample,Diameter (mm),Number of scans,Phase1,Fraction1\n'+rows,database)
+
+def test_manifestBlankNumberOfScansIsOneScan(database):
+    schedule=planCsv('Sample,Diameter (mm),Number of scans,Phase1,Fraction1\na,10,,Quartz,0.5\nb,10,3,Quartz,0.5\n',database)
+    assert schedule['Number of scans'].tolist()==[1,3]
+
+def test_uploadScheduleIsPlannedOncePerFileAndSettings(database):
+    data=xct_batch.MANIFEST_EXAMPLE.to_csv(index=False).encode()
+    first=xct_batch.planUpload(data,database,'2x','1920','Fe',0.05,160)
+    done=[]
+    assert xct_batch.planUpload(data,database,'2x','1920','Fe',0.05,160,progress=done.append) is first
+    assert done==[1.0]
+    other=xct_batch.planUpload(data,database,'1x','1920','Fe',0.05,160)
+    assert other is not first and other['Voxel Size (um)'].tolist()!=first['Voxel Size (um)'].tolist()
+    assert xct_batch.planUpload(data.replace(b'core_A',b'core_C'),database,'2x','1920','Fe',0.05,160)['Sample'][0]=='core_C'
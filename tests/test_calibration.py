@@ -0,0 +1,71 @@
+#Scanner calibration: the fit of the measured points gives back the coefficients of the original app, and is cached on disk
+import json
+import os
+import shutil
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import pytest
+import xct_calibration
+from test_engine import CAMERA_FACTORS,TIME_COEFFICIENTS,VOXEL_LINES
+
+@pytest.fixture
+def files(tmp_path):
+    paths=[str(tmp_path/os.path.basename(path)) for path in (xct_calibration.VOXEL_SIZE_FILE,xct_calibration.TIME_FILE)]
+    for source,path in zip((xct_calibration.VOXEL_SIZE_FILE,xct_calibration.TIME_FILE),paths):
+        shutil.copy(source,path)
+    return paths
+
+def test_fitMatchesTheOriginalCoefficients():
+    calibration=xct_calibration.fitCalibration(pd.read_csv(xct_calibration.VOXEL_SIZE_FILE,dtype=xct_calibration.LABELS),
+                                               pd.read_csv(xct_calibration.TIME_FILE,dtype=xct_calibration.LABELS))
+    for (binning,detector),(slope,intercept) in VOXEL_LINES.items():
+        b,d=calibration.binnings.index(binning),calibration.detectors.index(detector)
+        assert (calibration.vsSlope[b,d],calibration.vsIntercept[b,d])==pytest.approx((slope,intercept),abs=1e-4)
+    for binning,coefficients in TIME_COEFFICIENTS.items():
+        assert calibration.timeCoefficients[calibration.binnings.index(binning)].tolist()==pytest.approx(coefficients,abs=1e-4)
+    assert [calibration.cameraFactor[calibration.detectors.index(detector)] for detector in CAMERA_FACTORS]==pytest.approx(list(CAMERA_FACTORS.values()))
+
+def test_fitRecoversExactLines():
+    diameters=np.array([10.0,50.0,120.0])
+    points=pd.DataFrame({'Binning':'1x','Detector':'A','Diameter (mm)':diameters,'Voxel Size (um)':0.25*diameters+2})
+    thickness,energy,power=np.meshgrid([0,1],[60,160],[15,40])
+    time=pd.DataFrame({'Filter Thickness (mm)':thickness.ravel(),'Energy (kV)':energy.ravel(),'Power (W)':power.ravel()})
+    time['Scan Time (hrs)']=0.5*time['Filter Thickness (mm)']-0.01*time['Energy (kV)']-0.02*time['Power (W)']+4
+    timePoints=pd.concat([time.assign(Binning='1x',Detector='A'),
+                          time.assign(Binning='1x',Detector='B',**{'Scan Time (hrs)':time['Scan Time (hrs)']*2})])
+    calibration=xct_calibration.fitCalibration(points,timePoints)
+    assert calibration.detectors==('A','B')
+    assert (calibration.vsSlope[0,0],calibration.vsIntercept[0,0])==pytest.approx((0.25,2))
+    assert np.isnan(calibration.vsSlope[0,1])          # no voxel size point for detector B
+    assert calibration.timeCoefficients[0].tolist()==pytest.approx([0.5,-0.01,-0.02,4])
+    assert calibration.cameraFactor.tolist()==pytest.approx([1,2])
+
+def test_calibrationIsReadFromTheCache(files,tmp_path,monkeypatch):
+    cacheDir=str(tmp_path/'cache')
+    first=xct_calibration.loadCalibration(*files,cacheDir=cacheDir)
+    key=xct_calibration.calibrationKey(*files)
+    cachePath=os.path.join(cacheDir,'calibration_%s.json'%key[:16])
+    assert os.listdir(cacheDir)==[os.path.basename(cachePath)] and first.key==key
+    ########### the second load does not fit again
+    monkeypatch.setattr(xct_calibration,'fitCalibration',lambda *args: pytest.fail('fitted again'))
+    cached=xct_calibration.loadCalibration(*files,cacheDir=cacheDir)
+    assert cached.toDict()==first.toDict()
+
+def test_calibrationIsFittedAgainWhenThePointsChange(files,tmp_path):
+    cacheDir=str(tmp_path/'cache')
+    first=xct_calibration.loadCalibration(*files,cacheDir=cacheDir)
+    with open(files[0],'a') as file:
+        file.write('1x,1920,80,50\n')
+    second=xct_calibration.loadCalibration(*files,cacheDir=cacheDir)
+    assert second.key!=first.key and len(os.listdir(cacheDir))==2
+    assert second.vsSlope[0,0]!=first.vsSlope[0,0]
+
+def test_cacheOfOtherPointsIsNotUsed(files,tmp_path):
+    ########### a cache file with the same name but another key (e.g. copied from elsewhere) is fitted again and replaced
+    cacheDir=str(tmp_path/'cache')
+    first=xct_calibration.loadCalibration(*files,cacheDir=cacheDir)
+    cachePath=os.path.join(cacheDir,os.listdir(cacheDir)[0])
+    values=dict(first.toDict(),key='other',vsSlope=np.zeros_like(first.vsSlope).tolist())
+    with open(cachePath,'w') as file:
+        json.dump(values,file)
+    assert xct_calibration.loadCalibration(*files,cacheDir=cacheDir).toDict()==first.toDict()
@@ -0,0 +1,48 @@
+#Contrast tab: the Pareto front of scan time against contrast and the recommended setting
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_contrast
+import xct_sweep
+
+def randomPlans(count,seed=0):
+    rng=np.random.default_rng(seed)
+    ########### rounded values so that ties in time and contrast happen
+    return pd.DataFrame({'Scan Time (hrs)':rng.integers(1,20,count)/10,'Contrast (cm-1)':rng.integers(0,30,count)/10,
+                         'CNR':rng.random(count)})
+
+def dominated(plan,plans):
+    ########### another setting is at least as fast with at least as much contrast, and better in one of them
+    time,contrast=plans['Scan Time (hrs)'].to_numpy(),plans['Contrast (cm-1)'].to_numpy()
+    return bool((((time<=plan['Scan Time (hrs)'])&(contrast>=plan['Contrast (cm-1)']))
+                 &((time<plan['Scan Time (hrs)'])|(contrast>plan['Contrast (cm-1)']))).any())
+
+def checkFront(plans):
+    front=xct_contrast.paretoFront(plans)
+    assert not front.empty
+    assert not any(dominated(plan,plans) for _,plan in front.iterrows())
+    ########### every other setting is dominated by (or has the time and contrast of) a setting of the front
+    points=set(zip(front['Scan Time (hrs)'],front['Contrast (cm-1)']))
+    assert all(dominated(plan,front) or (plan['Scan Time (hrs)'],plan['Contrast (cm-1)']) in points for _,plan in plans.iterrows())
+    assert front['Scan Time (hrs)'].is_monotonic_increasing and (np.diff(front['Contrast (cm-1)'])>0).all()
+    return front
+
+def test_paretoFrontHasNoDominatedSetting():
+    for seed in range(5):
+        checkFront(randomPlans(200,seed))
+
+def test_paretoFrontOfTheContrastPlans(database):
+    plans=xct_contrast.contrastPlans(database,['Quartz','Calcite','Pyrite'],[0.4,0.3,0.2],20,21,'2x','1920',
+                                     thicknesses=[0,0.5,1],energies=np.arange(60,181,20))
+    assert (plans['Transmission at Emax (%)']>=xct_sweep.MIN_TRANSMISSION).all()
+    front=checkFront(plans)
+    assert xct_contrast.recommendation(front)['CNR']==front['CNR'].max()
+
+def test_recommendationHasTheBestCnrOfTheFront():
+    front=xct_contrast.paretoFront(randomPlans(100))
+    best=xct_contrast.recommendation(front)
+    assert best['CNR']==front['CNR'].max()
+    assert best.equals(front.iloc[int(np.argmax(front['CNR']))])
+
+def test_noSettingNoRecommendation():
+    assert xct_contrast.paretoFront(pd.DataFrame()).empty
+    assert xct_contrast.recommendation(xct_contrast.paretoFront(pd.DataFrame())) is None
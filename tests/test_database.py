@@ -0,0 +1,20 @@
+#Uploaded phases: invalid files raise ValueError (shown by the app), valid ones are resampled on the energies of the store
+import pandas as pd            # 1.5.3
+import pytest
+import xct_database
+
+@pytest.mark.parametrize('data',[b'Energy (kV),A\n',b'Energy (kV),A\n10,1\n',b'',b'Energy (kV),A\n20,1\n10,2\n',b'Energy (kV),A\n10,1\n20,-2\n'])
+def test_uploadRejectsInvalidFiles(data):
+    with pytest.raises(ValueError):
+        xct_database.ingestUpload(data,[10,15,20])
+
+def test_uploadIsResampledLogLog():
+    table=xct_database.ingestUpload(b'Energy (kV),A\n10,1\n20,0.25\n',[10,14.142135623730951,20,30])
+    assert table['A'].iloc[:3].tolist()==pytest.approx([1,0.5,0.25])
+    assert pd.isna(table['A'].iloc[3])
+
+def test_uploadIsParsedOncePerFileContent():
+    data=b'Energy (kV),B\n10,1\n20,0.25\n'
+    first=xct_database.ingestUpload(data,[10,20])
+    assert xct_database.ingestUpload(data,[10,20]) is first
+    assert xct_database.ingestUpload(data,[10,15,20]) is not first
@@ -0,0 +1,89 @@
+#xct_engine pinned against the formulas of the original app (hard-coded CoreTOM coefficients, see the baseline of
+#xct_explorer_expert_270824.py), for single values and for the vectorized calls of the sweep and the batch planner
+import itertools
+import math
+import numpy as np            # <2
+import pytest
+import xct_engine as xct
+
+########### (binning, detector) -> values of the original app
+VOXEL_LINES={('1x','1920'):(0.5627,-0.5293),('1x','2856'):(0.3626,0.0151),('2x','1920'):(1.1254,-1.0585),
+             ('2x','2856'):(0.7236,0.4404),('3x','1920'):(1.6881,-1.5878),('3x','2856'):(1.1254,-1.0585)}
+DATA_SIZES={('1x','1920'):11,('1x','2856'):32,('2x','1920'):1.4,('2x','2856'):4.3,('3x','1920'):0.4,('3x','2856'):1.2}
+RED_TIMES={('1x','1920'):4.2,('1x','2856'):6.2,('2x','1920'):2.2,('2x','2856'):3.2,('3x','1920'):1.5,('3x','2856'):2.2}
+TIME_COEFFICIENTS={'1x':(1.38,-0.0198,-0.0328,6.048),'2x':(0.68,-0.0109,-0.0152,2.607),'3x':(0.328,-0.0055,-0.0068,1.19)}
+CAMERA_FACTORS={'1920':1,'2856':1.4875}
+SETTINGS=list(itertools.product(('1x','2x','3x'),('1920','2856')))
+
+def baselineVoxelSize(diameter,binning,detector):
+    slope,intercept=VOXEL_LINES[(binning,detector)]
+    return int(slope*diameter+intercept)
+
+def baselineScanTime(voxel,binning,detector,filterThickness,maximumEnergy):
+    power=15 if voxel<15 else voxel
+    a,e,p,c=TIME_COEFFICIENTS[binning]
+    return max(round((a*filterThickness+e*maximumEnergy+p*power+c)*CAMERA_FACTORS[detector],1),0.1)
+
+@pytest.mark.parametrize('binning,detector',SETTINGS)
+def test_voxelSizeMatchesBaseline(binning,detector):
+    for diameter in range(0,151):
+        assert xct.voxelSize(diameter,binning,detector)==max(baselineVoxelSize(diameter,binning,detector),xct.MINIMUM_VOXEL)
+
+@pytest.mark.parametrize('binning,detector',SETTINGS)
+def test_voxelSizeNeverBelowOneMicron(binning,detector):
+    ########### the calibration lines drop to 0 um or below for the smallest diameters
+    assert xct.voxelSize(0,binning,detector)==xct.MINIMUM_VOXEL
+    assert xct.voxelSize(1,binning,detector)>=xct.MINIMUM_VOXEL
+    assert np.all(xct.voxelSize(np.arange(0,3),binning,detector)>=xct.MINIMUM_VOXEL)
+
+@pytest.mark.parametrize('binning,detector',SETTINGS)
+def test_scanTimeMatchesBaseline(binning,detector):
+    for voxel,filterThickness,maximumEnergy in itertools.product((5,15,40,90),(0,0.05,0.5,2),(60,100,160,200)):
+        assert xct.scanTime(voxel,binning,detector,filterThickness,maximumEnergy)==pytest.approx(
+            baselineScanTime(voxel,binning,detector,filterThickness,maximumEnergy),abs=1e-9)
+
+@pytest.mark.parametrize('binning,detector',SETTINGS)
+def test_settingTablesMatchBaseline(binning,detector):
+    assert xct.dataSize(binning,detector)==DATA_SIZES[(binning,detector)]
+    assert xct.isLongScan(RED_TIMES[(binning,detector)]+0.1,binning,detector)
+    assert not xct.isLongScan(RED_TIMES[(binning,detector)],binning,detector)
+
+def test_minimumFeatureAndExperimentTime():
+    assert [xct.minimumFeature(10,purpose) for purpose in xct.PURPOSES]==[30,50,70]
+    assert xct.experimentTime(1.3,3)==round((1.3+0.2)*3,1)
+
+def test_vectorizedCallsMatchSingleValues():
+    ########### index arrays over binning x detector, as used by the sweep
+    diameters=np.arange(1,151).reshape(-1,1,1)
+    binnings=np.arange(len(xct.BINNINGS)).reshape(1,-1,1)
+    detectors=np.arange(len(xct.DETECTORS)).reshape(1,1,-1)
+    voxel=xct.voxelSize(diameters,binnings,detectors)
+    time=xct.scanTime(voxel,binnings,detectors,0.05,160)
+    for d,b,k in itertools.product(range(0,150,7),range(len(xct.BINNINGS)),range(len(xct.DETECTORS))):
+        single=xct.voxelSize(d+1,xct.BINNINGS[b],xct.DETECTORS[k])
+        assert voxel[d,b,k]==single
+        assert time[d,b,k]==xct.scanTime(single,xct.BINNINGS[b],xct.DETECTORS[k],0.05,160)
+
+def test_evaluatePlanMatchesBaseline(database):
+    plan=xct.ScanPlan(diameter=20,purpose='Quantify',binning='2x',detector='1920',phases=('Quartz','Calcite'),fractions=(0.6,0.3),numberOfScans=2)
+    result=xct.evaluatePlan(plan,database)
+    voxel=baselineVoxelSize(20,'2x','1920')
+    assert result['voxelSize']==voxel
+    assert result['minimumFeature']==voxel*5
+    assert result['scanTime']==pytest.approx(baselineScanTime(voxel,'2x','1920',0.05,160))
+    assert result['experimentTime']==pytest.approx(round((result['scanTime']+0.2)*2,1))
+    assert result['dataSize']==1.4
+    ########### Lambert-Beer law, mu in cm-1 and diameter in mm
+    mu=0.6*database['Quartz']+0.3*database['Calcite']
+    np.testing.assert_allclose(result['transmission']['Sample'],np.exp(-mu*2)*100)
+    np.testing.assert_allclose(result['transmission']['Filter'],np.exp(-database['Fe']*0.005)*100)
+
+def test_transmissionAtMatchesTheTableAtItsEnergies(database):
+    table=xct.transmission(database,['Quartz','Calcite'],[0.6,0.3],20,'Fe',0.05)
+    at=xct.transmissionAt(database,['Quartz','Calcite'],[0.6,0.3],20,'Fe',0.05,table['Energy (kV)'])
+    np.testing.assert_allclose(at,table['Filter+Sample'])
+    ########### one row per sample, and nan outside the energies of the table
+    samples=xct.transmissionAt(database,['Quartz','Calcite'],np.array([[0.6,0.3],[0,0]]),np.array([20,20]),'Fe',0.05,100)
+    assert samples[0]==pytest.approx(xct.transmissionAt(database,['Quartz','Calcite'],[0.6,0.3],20,'Fe',0.05,100))
+    assert samples[1]==pytest.approx(math.exp(-xct.attenuationAt(database,'Fe',100)*0.005)*100)
+    assert math.isnan(xct.transmissionAt(database,['Quartz'],[0.5],20,'Fe',0.05,500))
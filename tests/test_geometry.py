@@ -0,0 +1,66 @@
+#Sample shapes: the path lengths of the rays through the parametric shapes and voxel masks against their analytic values
+import math
+import numpy as np            # <2
+import pytest
+import xct_geometry
+
+def pixelArea(width,height,pixels=xct_geometry.PIXELS):
+    return (max(width,height)*1.05/pixels)**2          # mm2, field of view of projectionGrid
+
+def test_cylinderChords():
+    ########### mean chord of a circle over its width is its area over its diameter, pi/4 D
+    paths=xct_geometry.cylinderPaths(20,30)[xct_geometry.SAMPLE]
+    crossed=paths[paths>0]
+    assert crossed.mean()==pytest.approx(math.pi/4*20,rel=1e-2)
+    assert crossed.max()==pytest.approx(20,rel=1e-3)
+    assert crossed.size*pixelArea(20,30)==pytest.approx(20*30,rel=1e-2)            # projected area
+    ########### every row crossing the cylinder has the same chords
+    rows=paths[(paths>0).any(axis=1)]
+    assert (rows==rows[0]).all()
+
+def test_sphereVolume():
+    paths=xct_geometry.spherePaths(10)[xct_geometry.SAMPLE]
+    assert paths.sum()*pixelArea(10,10)==pytest.approx(math.pi/6*10**3,rel=1e-3)
+    assert paths.max()==pytest.approx(10,rel=1e-3)
+
+@pytest.mark.parametrize('angle',[0,30,45,90,135])
+def test_boxVolumeAtEveryAngle(angle):
+    paths=xct_geometry.boxPaths(8,4,6,angle)[xct_geometry.SAMPLE]
+    assert paths.sum()*pixelArea(math.hypot(8,4),6)==pytest.approx(8*4*6,rel=1e-2)
+
+def test_boxPathsCrossTheDepth():
+    assert xct_geometry.boxPaths(8,4,6,0)[xct_geometry.SAMPLE].max()==pytest.approx(4)
+    assert xct_geometry.boxPaths(8,4,6,90)[xct_geometry.SAMPLE].max()==pytest.approx(8)
+    assert xct_geometry.boxPaths(5,5,6,45)[xct_geometry.SAMPLE].max()==pytest.approx(5*math.sqrt(2),rel=1e-2)
+
+def test_tubeWallVolume():
+    paths=xct_geometry.tubePaths(10,20,1,'Polystyrene')
+    area=pixelArea(12,20)
+    assert paths[xct_geometry.SAMPLE].sum()*area==pytest.approx(math.pi*5**2*20,rel=1e-2)
+    assert paths['Polystyrene'].sum()*area==pytest.approx(math.pi*(6**2-5**2)*20,rel=1e-2)
+    assert (paths['Polystyrene']>=0).all()
+
+def test_maskPaths():
+    mask=np.zeros((3,10,12),dtype=np.uint8)
+    mask[:,:,:6]=1
+    mask[:,:,6:]=2
+    paths=xct_geometry.maskPaths(mask,100,materials={1:'Sample',2:'Quartz'})
+    assert paths['Sample'].shape==(3,12)
+    np.testing.assert_allclose(paths['Sample'][:,:6],1.0)          # 10 voxels of 100 um
+    np.testing.assert_allclose(paths['Quartz'][:,6:],1.0)
+    assert (paths['Sample'][:,6:]==0).all()
+    ########### rotated masks keep their volume, a few rows at a time or all at once
+    rotated=xct_geometry.maskPaths(mask,100,angle=30,chunkRows=1)[xct_geometry.SAMPLE]
+    assert rotated.sum()*0.1**2==pytest.approx(mask.size*0.1**3,rel=0.05)
+    np.testing.assert_array_equal(rotated,xct_geometry.maskPaths(mask,100,angle=30,chunkRows=3)[xct_geometry.SAMPLE])
+
+def test_maskRejectsOtherDimensions():
+    with pytest.raises(ValueError):
+        xct_geometry.maskPaths(np.ones((4,4)),100)
+
+def test_pathDistributionKeepsEveryPixel():
+    paths=xct_geometry.cylinderPaths(20,30,pixels=128)
+    names,lengths,counts=xct_geometry.pathDistribution(paths)
+    crossed=paths[xct_geometry.SAMPLE][paths[xct_geometry.SAMPLE]>0]
+    assert names==[xct_geometry.SAMPLE] and counts.sum()==crossed.size
+    assert (lengths[:,0]@counts)/counts.sum()==pytest.approx(crossed.mean(),abs=xct_geometry.PATH_RESOLUTION)
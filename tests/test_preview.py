@@ -0,0 +1,45 @@
+#Slice preview: invalid samples raise ValueError, the memory blocks and groups of angles only change the memory, not the slice
+import tracemalloc
+import numpy as np            # <2
+import pytest
+import xct_preview
+
+@pytest.mark.parametrize('diameter,voxelSize',[(0,10),(20,0),(20,-1),(20,float('nan'))])
+def test_previewRejectsEmptySample(database,diameter,voxelSize):
+    with pytest.raises(ValueError):
+        xct_preview.slicePreview(database,['Quartz'],[0.5],diameter,voxelSize,'Fe',0.05,160,pixels=32,angles=30)
+
+def test_previewReconstructsThePhases(database):
+    preview=xct_preview.slicePreview(database,['Quartz','Pyrite'],[0.5,0.3],5,50,'Fe',0.05,160,pixels=64,angles=60,photons=10**6)
+    quartz,pyrite=preview['phases']['Reconstructed (cm-1)']
+    assert preview['slice'].shape==(64,64)
+    assert 0<quartz<pyrite
+
+def test_previewMemoryBlocksDoNotChangeTheResult():
+    labels=xct_preview.phantom(64,[0.5,0.3])
+    mu=np.array([[0.0,0.0],[1.0,0.5],[2.0,1.0]])          # air and two phases at two energies
+    signal=np.ones(2)
+    angles=np.array([0.0,0.5,1.0])
+    whole=xct_preview.projectChunk(labels,angles,mu,signal,10**4,0.01,(0,0))
+    blocks=xct_preview.projectChunk(labels,angles,mu,signal,10**4,0.01,(0,0),blockPoints=100)
+    assert (whole==blocks).all()
+    assert (xct_preview.backprojectChunk(whole,angles)==xct_preview.backprojectChunk(whole,angles,blockPoints=100)).all()
+
+def test_reconstructionInChunksMatchesTheWholeSinogram():
+    angles=np.linspace(0,np.pi,30,endpoint=False)
+    sinogram=np.random.default_rng(0).random((30,64),dtype=np.float32)
+    whole=xct_preview.backprojectChunk(xct_preview.rampFilter(sinogram),angles)
+    np.testing.assert_allclose(xct_preview.reconstructChunks(sinogram,angles),whole,atol=1e-5)
+
+def reconstructionPeak(angles,pixels=256):
+    sinogram=np.random.default_rng(0).random((angles,pixels),dtype=np.float32)
+    theta=np.linspace(0,np.pi,angles,endpoint=False)
+    tracemalloc.start()
+    xct_preview.reconstructChunks(sinogram,theta)
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def test_reconstructionMemoryDoesNotGrowWithTheAngles():
+    ########### one slice and the temporaries of one chunk of angles, 600 angles used to keep 75 partial slices of 256 kb
+    assert reconstructionPeak(600)<reconstructionPeak(60)*1.2
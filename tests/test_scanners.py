@@ -0,0 +1,77 @@
+#Scanner profiles: the toml files are compiled into the (binning, detector) lookup table and the arrays of the vectorized equations
+import os
+import shutil
+import numpy as np            # <2
+import pytest
+import xct_calibration
+import xct_engine as xct
+import xct_scanners
+from test_engine import DATA_SIZES,RED_TIMES,VOXEL_LINES
+
+PROFILE='''name = "Bench"
+binnings = ["2x", "1x"]
+detectors = ["1920"]
+voxelSizeCalibration = "points/voxelsize.csv"
+timeCalibration = "points/time.csv"
+minimumPower = 10
+minimumScanTime = 0.2
+setupTime = 0.5
+
+[detectorPixels]
+1920 = 1920
+
+[binningFactors]
+1x = 1
+2x = 2
+
+[dataSize]
+1x = { 1920 = 12 }
+2x = { 1920 = 1.5 }
+
+[redTime]
+1x = { 1920 = 5 }
+2x = { 1920 = 2.5 }
+'''
+
+@pytest.fixture
+def scannerDir(tmp_path):
+    ########### a second instrument with its own folder of measured points, paths relative to the profile
+    os.makedirs(tmp_path/'points')
+    shutil.copy(xct_calibration.VOXEL_SIZE_FILE,tmp_path/'points'/'voxelsize.csv')
+    shutil.copy(xct_calibration.TIME_FILE,tmp_path/'points'/'time.csv')
+    (tmp_path/'bench.toml').write_text(PROFILE)
+    return str(tmp_path)
+
+def test_coretomProfileMatchesTheOriginalTables():
+    scanner=xct_scanners.loadScanners()[xct_scanners.DEFAULT_SCANNER]
+    assert (scanner.binnings,scanner.detectors,scanner.defaultBinning,scanner.defaultDetector)==(('1x','2x','3x'),('2856','1920'),'2x','1920')
+    for (binning,detector),setting in scanner.table.items():
+        assert (setting.vsSlope,setting.vsIntercept)==pytest.approx(VOXEL_LINES[(binning,detector)])
+        assert (setting.dataSize,setting.redTime)==(DATA_SIZES[(binning,detector)],RED_TIMES[(binning,detector)])
+        assert setting.pixels==int(detector)//int(binning[0])
+
+def test_profileIsCompiled(scannerDir):
+    scanner=xct_scanners.loadScanners(scannerDir)['Bench']
+    assert (scanner.binnings,scanner.detectors)==(('2x','1x'),('1920',))
+    assert (scanner.defaultBinning,scanner.defaultDetector)==('2x','1920')          # first options when not given
+    assert (scanner.minimumPower,scanner.minimumScanTime,scanner.setupTime)==(10,0.2,0.5)
+    assert set(scanner.table)=={('2x','1920'),('1x','1920')}
+    setting=scanner.table[('1x','1920')]
+    assert (setting.vsSlope,setting.vsIntercept)==pytest.approx(VOXEL_LINES[('1x','1920')])
+    assert (setting.dataSize,setting.redTime,setting.pixels)==(12,5,1920)
+    assert scanner.table[('2x','1920')].pixels==960
+
+def test_profileArraysFollowTheOrderOfTheOptions(scannerDir):
+    scanner=xct_scanners.loadScanners(scannerDir)['Bench']
+    for field in xct_scanners.Setting._fields:
+        assert scanner.arrays[field].shape[:2]==(2,1)
+    np.testing.assert_array_equal(scanner.arrays['dataSize'][:,0],[1.5,12])
+    np.testing.assert_array_equal(scanner.arrays['timeCoefficients'][1,0],scanner.table[('1x','1920')].timeCoefficients)
+
+def test_engineUsesTheProfile(scannerDir):
+    scanner=xct_scanners.loadScanners(scannerDir)['Bench']
+    slope,intercept=VOXEL_LINES[('2x','1920')]
+    assert xct.voxelSize(20,'2x','1920',scanner)==int(slope*20+intercept)
+    assert xct.projectionPixels('2x','1920',scanner)==960
+    assert xct.dataSize('1x','1920',scanner)==12
+    assert xct.experimentTime(1.0,2,scanner)==3.0
@@ -0,0 +1,41 @@
+#Sweep of the scan settings: only feasible settings, fastest first, and the same plans as evaluating every setting one by one
+import itertools
+import numpy as np            # <2
+import pytest
+import xct_engine as xct
+import xct_sweep
+
+GRID={'diameters':[5,20,60],'filters':('Fe','Al'),'thicknesses':[0,0.5,1],'energies':[60,100,160]}
+COMPOSITION=(['Quartz','Calcite'],[0.6,0.3])
+
+def plainPlans(database,targetFeature,purpose):
+    ########### (experiment time, minimum feature) of every feasible setting, one setting at a time
+    plans=[]
+    for diameter,binning,detector,material,thickness,energy in itertools.product(GRID['diameters'],xct.BINNINGS,xct.DETECTORS,
+                                                                               GRID['filters'],GRID['thicknesses'],GRID['energies']):
+        voxel=xct.voxelSize(diameter,binning,detector)
+        feature=xct.minimumFeature(voxel,purpose)
+        transmission=xct.transmissionAt(database,*COMPOSITION,diameter,material,thickness,energy)
+        if feature<=targetFeature and transmission>=xct_sweep.MIN_TRANSMISSION:
+            plans.append((xct.experimentTime(xct.scanTime(voxel,binning,detector,thickness,energy),1),feature))
+    return sorted(plans)
+
+@pytest.mark.parametrize('targetFeature,purpose',[(60,'Qualitative'),(150,'Quantify'),(400,'Classify')])
+def test_sweepRanksTheFeasibleSettings(database,targetFeature,purpose):
+    table=xct_sweep.sweepPlans(database,*COMPOSITION,targetFeature,purpose,top=None,**GRID)
+    expected=plainPlans(database,targetFeature,purpose)
+    assert len(table)==len(expected)>0
+    np.testing.assert_allclose(table[['Experiment Time (hrs)','Minimum Feature (um)']].to_numpy(dtype=float),np.array(expected))
+    assert (table['Minimum Feature (um)']<=targetFeature).all() and (table['Voxel Size (um)']>=1).all()
+    assert (table['Transmission (%)']>=xct_sweep.MIN_TRANSMISSION).all()
+    assert set(table['Filter'])<=set(GRID['filters']) and set(table['Binning'])<=set(xct.BINNINGS)
+
+def test_sweepKeepsTheTopPlans(database):
+    table=xct_sweep.sweepPlans(database,*COMPOSITION,150,top=None,**GRID)
+    top=xct_sweep.sweepPlans(database,*COMPOSITION,150,top=5,**GRID)
+    assert top.equals(table.head(5))
+
+def test_sweepWithoutFeasibleSettingIsEmpty(database):
+    assert xct_sweep.sweepPlans(database,*COMPOSITION,1,**GRID).empty
+    ########### energies outside the table have no transmission
+    assert xct_sweep.sweepPlans(database,*COMPOSITION,400,**dict(GRID,energies=[500])).empty
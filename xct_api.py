@@ -0,0 +1,212 @@
+#Local HTTP/JSON planning API, runs next to the streamlit app and shares its physics (xct_engine) and attenuation store
+#   python xct_api.py [--host 127.0.0.1] [--port 8502] [--data-dir D]
+#   GET  /health                                   scanners and phases available
+#   GET  /plan?diameter=20&phases=Quartz,Calcite&fractions=0.7,0.2&maximumEnergy=140
+#   POST /plan   {"diameter":20,"binning":"2x","phases":["Quartz"],"fractions":[0.7]}
+#   POST /plans  {"plans":[{...},{...}]}         one result (or {"error":...}) per plan, in the same order
+#The inputs are the ones of the Geometric Parameters and Composition tabs (names of xct_engine.ScanPlan, missing ones take the
+#defaults of the app) and the answer holds the parameters of the Summary tab. Inputs are canonicalized (types, defaults, phases in
+#alphabetical order, no empty phases) so equal plans written differently share one entry of the LRU cache of encoded answers
+import argparse
+import dataclasses
+import functools
+import http.server
+import json
+import math
+import urllib.parse
+import xct_engine as xct
+import xct_database
+
+CACHE_SIZE=4096          # answers kept, a few hundred bytes each
+MAX_BATCH=10000          # plans per batch request
+MAX_BODY=16*1024*1024    # bytes
+FIELDS={field.name:field for field in dataclasses.fields(xct.ScanPlan)}
+
+################################ Plans ################################
+def canonicalPlan(values,database=None):
+    ########### dict of inputs -> ScanPlan with checked values, raises ValueError with a message for the client
+    unknown=sorted(set(values)-set(FIELDS))
+    if unknown:
+        raise ValueError('unknown inputs: %s'%', '.join(unknown))
+    scannerName=str(values.get('scanner',FIELDS['scanner'].default))
+    if scannerName not in xct.SCANNERS:
+        raise ValueError('scanner must be one of %s'%', '.join(xct.SCANNERS))
+    scanner=xct.SCANNERS[scannerName]
+    plan={'scanner':scannerName,'binning':str(values.get('binning',scanner.defaultBinning)),'detector':str(values.get('detector',scanner.defaultDetector)),
+          'purpose':str(values.get('purpose',FIELDS['purpose'].default)),'filterMaterial':str(values.get('filterMaterial',FIELDS['filterMaterial'].default))}
+    for name,labels in (('binning',scanner.binnings),('detector',scanner.detectors),('purpose',xct.PURPOSES),('filterMaterial',xct.FILTERS)):
+        if plan[name] not in labels:
+            raise ValueError('%s must be one of %s'%(name,', '.join(labels)))
+    try:
+        for name in ('diameter','filterThickness','maximumEnergy'):
+            plan[name]=float(values.get(name,FIELDS[name].default))
+        scans=values.get('numberOfScans',FIELDS['numberOfScans'].default)
+        if isinstance(scans,bool) or not float(scans).is_integer():          # no true or 2.7 truncated to a number of scans
+            raise TypeError
+        plan['numberOfScans']=int(float(scans))
+        phases,fractions=listValue(values.get('phases',())),[float(fraction) for fraction in listValue(values.get('fractions',()))]
+        if not all(isinstance(phase,str) for phase in phases):
+            raise TypeError
+    except (TypeError,ValueError):
+        raise ValueError('diameter, filterThickness, maximumEnergy, fractions must be numbers, phases names and numberOfScans an integer') from None
+    if not all(math.isfinite(plan[name]) and plan[name]>=0 for name in ('diameter','filterThickness','maximumEnergy')) or plan['numberOfScans']<1:
+        raise ValueError('diameter, filterThickness and maximumEnergy must be positive and numberOfScans at least 1')
+    if len(phases)!=len(fractions):
+        raise ValueError('phases and fractions must have the same length')
+    if not all(0<=fraction<=1 for fraction in fractions) or sum(fractions)>1+1e-9:
+        raise ValueError('fractions must be between 0 and 1 and add up to at most 1')
+    if database is not None:
+        missing=[phase for phase in phases if phase not in database.columns or phase==xct_database.ENERGY]
+        if missing:
+            raise ValueError('phases not in the database: %s'%', '.join(map(str,missing)))
+    ########### the same phase given twice is added up, empty phases are dropped, phases sorted by name
+    composition={}
+    for phase,fraction in zip(phases,fractions):
+        composition[str(phase)]=composition.get(str(phase),0.0)+fraction
+    composition=sorted((phase,fraction) for phase,fraction in composition.items() if fraction>0)
+    plan['phases']=tuple(phase for phase,_ in composition)
+    plan['fractions']=tuple(fraction for _,fraction in composition)
+    return xct.ScanPlan(**plan)
+
+def listValue(value):
+    ########### lists can be given as json arrays or as comma separated text (query strings)
+    if isinstance(value,str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+def jsonNumber(value):
+    value=xct.asScalar(value)
+    return None if isinstance(value,float) and not math.isfinite(value) else value
+
+def planSummary(plan,database=None):
+    ########### parameters of the Summary tab, plus the transmission at Emax if the phases are known
+    result=xct.evaluatePlan(plan)
+    summary={'scanner':plan.scanner,'diameter':plan.diameter,'voxelSize':result['voxelSize'],'purpose':plan.purpose,
+             'minimumFeature':result['minimumFeature'],'binning':plan.binning,'detector':plan.detector,'maximumEnergy':plan.maximumEnergy,
+             'filterMaterial':plan.filterMaterial,'filterThickness':plan.filterThickness,'dataSize':result['dataSize'],
+             'scanTime':result['scanTime'],'numberOfScans':plan.numberOfScans,'experimentTime':result['experimentTime'],'longScan':bool(result['longScan']),
+             'phases':list(plan.phases),'fractions':list(plan.fractions),'porosity':round(1-sum(plan.fractions),6)}
+    if database is not None:
+        ########### at least 10% is advised
+        summary['transmissionAtEmax']=xct.transmissionAt(database,plan.phases,plan.fractions,plan.diameter,plan.filterMaterial,
+                                                         plan.filterThickness,plan.maximumEnergy)
+    return {name:jsonNumber(value) for name,value in summary.items()}
+
+class Planner:
+    ########### canonical plan -> encoded json answer, in an LRU cache
+    def __init__(self,database=None,cacheSize=CACHE_SIZE):
+        self.database=database
+        self.answer=functools.lru_cache(maxsize=cacheSize)(self.encode)
+
+    def encode(self,key):
+        return json.dumps(planSummary(xct.ScanPlan(*key),self.database)).encode()
+
+    def plan(self,values):
+        ########### encoded answer of one plan, raises ValueError for invalid inputs
+        if not isinstance(values,dict):
+            raise ValueError('a plan must be a json object')
+        return self.answer(dataclasses.astuple(canonicalPlan(values,self.database)))
+
+    def plans(self,plans):
+        ########### one answer per plan, invalid plans get an error and do not stop the others
+        if not isinstance(plans,list) or len(plans)>MAX_BATCH:
+            raise ValueError('plans must be a list of at most %d plans'%MAX_BATCH)
+        answers=[]
+        for values in plans:
+            try:
+                answers.append(self.plan(values))
+            except ValueError as error:
+                answers.append(json.dumps({'error':str(error)}).encode())
+        return b'{"results":['+b','.join(answers)+b']}'
+
+    def health(self):
+        phases=[] if self.database is None else [phase for phase in self.database.columns if phase!=xct_database.ENERGY]
+        return json.dumps({'status':'ok','scanners':{name:{'binnings':scanner.binnings,'detectors':scanner.detectors}
+                                                     for name,scanner in xct.SCANNERS.items()},
+                           'purposes':xct.PURPOSES,'filters':xct.FILTERS,'phases':phases}).encode()
+
+################################ HTTP ################################
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version='HTTP/1.1'          # keep-alive, clients can send many requests on one connection
+    disable_nagle_algorithm=True         # small answers are sent at once instead of waiting for the ack of the headers
+    planner=None
+
+    def send(self,status,body):
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self,status,message):
+        self.send(status,json.dumps({'error':message}).encode())
+
+    def do_GET(self):
+        url=urllib.parse.urlsplit(self.path)
+        if url.path=='/health':
+            self.send(200,self.planner.health())
+        elif url.path=='/plan':
+            try:
+                self.send(200,self.planner.plan(dict(urllib.parse.parse_qsl(url.query))))
+            except ValueError as error:
+                self.error(400,str(error))
+        else:
+            self.error(404,'unknown path %s'%url.path)
+
+    def do_POST(self):
+        path=urllib.parse.urlsplit(self.path).path
+        try:
+            length=int(self.headers.get('Content-Length') or 0)
+            if length<0:
+                raise ValueError
+        except ValueError:
+            ########### the end of the body is unknown, so the connection cannot be used for another request
+            self.error(400,'Content-Length must be a number of bytes')
+            self.close_connection=True
+            return
+        if length>MAX_BODY:
+            self.error(413,'request larger than %d bytes'%MAX_BODY)
+            self.close_connection=True
+            return
+        body=self.rfile.read(length)
+        try:
+            values=json.loads(body or b'{}')
+            if path=='/plan':
+                self.send(200,self.planner.plan(values))
+            elif path=='/plans':
+                self.send(200,self.planner.plans(values.get('plans') if isinstance(values,dict) else values))
+            else:
+                self.error(404,'unknown path %s'%path)
+        except ValueError as error:           # json.JSONDecodeError is a ValueError
+            self.error(400,str(error))
+
+    def log_message(self,format,*args):
+        pass                                  # no line per request on stderr
+
+def makeServer(host='127.0.0.1',port=8502,database=None,cacheSize=CACHE_SIZE):
+    handler=type('PlanHandler',(Handler,),{'planner':Planner(database,cacheSize)})
+    return http.server.ThreadingHTTPServer((host,port),handler)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='HTTP/JSON planning API of the XCT-Explorer')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8502)
+    parser.add_argument('--data-dir',default=xct_database.DATA_DIR,help='attenuation store, without it the transmission at Emax is not given')
+    parser.add_argument('--cache-size',type=int,default=CACHE_SIZE)
+    args=parser.parse_args(argv)
+    try:
+        database=xct_database.loadStore(args.data_dir)
+    except FileNotFoundError as error:
+        print('%s\nplans are answered without transmission'%error)
+        database=None
+    server=makeServer(args.host,args.port,database,args.cache_size)
+    print('planning API on http://%s:%d (Ctrl+C to stop)'%(args.host,args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,217 @@
+#Benchmarks of the planning pipeline on a fixed synthetic attenuation table, no network access needed
+#   python xct_benchmark.py [--repeat 5] [--phases 40] [--only spectrum] [--app] [--output results.csv]
+#Every benchmark reports the median and best wall time, the throughput (items per second) and the peak memory allocated by python
+#and numpy (tracemalloc, measured in one extra run so it does not slow down the timed ones)
+#--app also reruns the whole streamlit app with AppTest and reports the time of each section from the timing log (see xct_timing.py)
+import argparse
+import atexit
+import dataclasses
+import http.client
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+########### the synthetic database and the calibration cache go to a temporary folder, set before the xct modules read XCT_DATA_DIR
+BENCH_DIR=tempfile.mkdtemp(prefix='xct_benchmark_')
+atexit.register(shutil.rmtree,BENCH_DIR,ignore_errors=True)
+os.environ['XCT_DATA_DIR']=BENCH_DIR
+os.environ['XCT_TIMING_LOG']=os.path.join(BENCH_DIR,'timing.jsonl')
+
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_engine as xct
+import xct_database
+import xct_sweep
+import xct_spectrum
+import xct_charts
+import xct_contrast
+import xct_batch
+import xct_geometry
+import xct_preview
+import xct_api
+
+APP=os.path.join(os.path.dirname(os.path.abspath(__file__)),'xct_explorer_expert_270824.py')
+ENERGIES=np.round(np.geomspace(10,200,60),2)       # kV, same range as the database
+SEED=2024
+
+################################ Synthetic inputs ################################
+def syntheticTable(phases=40,energies=ENERGIES,seed=SEED):
+    ########### photoelectric (E^-3) + Compton (slowly decreasing) attenuation, with the phase and filter names used by the app
+    rng=np.random.default_rng(seed)
+    names=list(xct.FILTERS)+['Phase%02d'%number for number in range(1,phases-len(xct.FILTERS)+1)]
+    photoelectric=rng.uniform(0.05,400,len(names))
+    compton=rng.uniform(0.1,0.6,len(names))
+    mu=photoelectric[None,:]*(energies[:,None]/30)**-3+compton[None,:]*(energies[:,None]/30)**-0.3
+    return pd.concat([pd.DataFrame({'Energy (kV)':energies}),pd.DataFrame(mu,columns=names)],axis=1)
+
+def syntheticManifest(samples,phases,seed=SEED):
+    rng=np.random.default_rng(seed)
+    fractions=rng.dirichlet(np.ones(4),samples)[:,:3]
+    manifest={'Sample':['sample%06d'%number for number in range(samples)],'Diameter (mm)':rng.integers(1,100,samples),
+              'Number of scans':rng.integers(1,4,samples)}
+    for number in range(3):
+        manifest['Phase%d'%(number+1)]=rng.choice(phases,samples)
+        manifest['Fraction%d'%(number+1)]=fractions[:,number]
+    return pd.DataFrame(manifest)
+
+def syntheticPlans(count,phases,seed=SEED):
+    rng=np.random.default_rng(seed)
+    return [xct.ScanPlan(diameter=int(rng.integers(1,150)),binning=str(rng.choice(xct.BINNINGS)),detector=str(rng.choice(xct.DETECTORS)),
+                         phases=tuple(rng.choice(phases,2,replace=False)),fractions=(0.6,0.3),filterThickness=float(rng.choice(xct_sweep.SWEEP_THICKNESSES)),
+                         maximumEnergy=int(rng.choice(xct_contrast.CONTRAST_ENERGIES)))
+            for _ in range(count)]
+
+def syntheticUpload(phases=300,rows=2000,seed=SEED):
+    ########### csv bytes of new phases, on a finer energy grid than the database
+    table=syntheticTable(phases+len(xct.FILTERS),np.round(np.geomspace(5,250,rows),4),seed).drop(columns=list(xct.FILTERS))
+    return table.rename(columns=lambda name: name.replace('Phase','Upload')).to_csv(index=False).encode()
+
+def apiRequests(server,bodies):
+    ########### POST /plan of every body on one keep-alive connection, as a booking system would
+    connection=http.client.HTTPConnection(*server.server_address)
+    for body in bodies:
+        connection.request('POST','/plan',body,{'Content-Type':'application/json'})
+        connection.getresponse().read()
+    connection.close()
+
+def clearCaches():
+    ########### cold start of the cached steps
+    xct_database.UPLOAD_CACHE.clear()
+    xct_preview.PREVIEW_CACHE.clear()
+    xct_spectrum.ATTENUATION_CACHE.clear()
+    xct_contrast.FILTERED_CACHE.clear()
+    xct_contrast.CONTRAST_CACHE.clear()
+    xct_charts.REGRESSION_CACHE.clear()
+    xct_charts.attenuationLayer.cache_clear()
+
+################################ Measure ################################
+def measure(function,repeat,setup=None):
+    ########### wall times of repeat runs, then the peak memory of one more run
+    times=[]
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start=time.perf_counter()
+        function()
+        times.append(time.perf_counter()-start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    function()
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return times,peak
+
+def benchmarks(table,phases):
+    ########### (group, name, items per run, function, setup)
+    main=phases[5:8]
+    fractions=[0.5,0.3,0.1]
+    manifest=syntheticManifest(100000,phases)
+    plans=syntheticPlans(1000,phases)
+    dfTransmission=xct.transmission(table,main,fractions,20,'Fe',0.05)
+    spectrum=xct_spectrum.spectrumTransmission(table,main,fractions,20,'Fe',0.05,160)
+    dfSpectrum=pd.DataFrame({'Energy (kV)':spectrum['energies'],'Tube':spectrum['incident'],'Filter':spectrum['filtered'],'Filter+Sample':spectrum['detected']})
+    curves=[(phase,'blue',table['Energy (kV)'],table[phase]) for phase in main]
+    voxel=xct.voxelSize(20,'2x','1920')
+    upload=syntheticUpload()
+    rows,depth,columns=np.ogrid[:256,:256,:256]
+    mask=((depth-127.5)**2+(columns-127.5)**2<128**2)*(1+(rows>128))        # cylinder with two labels
+    cylinder=xct_geometry.cylinderPaths(20,20)
+    requests=[dict(dataclasses.asdict(plan),phases=list(plan.phases),fractions=list(plan.fractions)) for plan in plans]
+    planner=xct_api.Planner(table)
+    server=xct_api.makeServer('127.0.0.1',0,table)        # any free port, stops with the process
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    bodies=[json.dumps(values) for values in requests[:200]]
+    return [
+        ('database','write store',1,lambda: xct_database.writeStore(table,source='benchmark'),None),
+        ('database','load store (checksum)',1,lambda: xct_database.loadStore(verify=True),None),
+        ('database','load store',1,lambda: xct_database.loadStore(verify=False),None),
+        ('database','ingest upload (cold)',1,lambda: xct_database.ingestUpload(upload,table['Energy (kV)']),clearCaches),
+        ('database','ingest upload',1,lambda: xct_database.ingestUpload(upload,table['Energy (kV)']),None),
+        ('physics scalar','evaluate plan',len(plans),lambda: [xct.evaluatePlan(plan) for plan in plans],None),
+        ('physics scalar','evaluate plan with transmission',100,lambda: [xct.evaluatePlan(plan,table) for plan in plans[:100]],None),
+        ('physics scalar','transmission table',1,lambda: xct.transmission(table,main,fractions,20,'Fe',0.05),None),
+        ('physics scalar','spectrum (cold)',1,lambda: xct_spectrum.spectrumTransmission(table,main,fractions,20,'Fe',0.05,160),clearCaches),
+        ('physics scalar','spectrum',1,lambda: xct_spectrum.spectrumTransmission(table,main,fractions,20,'Fe',0.05,160),None),
+        ('physics batched','sweep one diameter',xct_sweep.SWEEP_THICKNESSES.size*xct_sweep.SWEEP_ENERGIES.size*len(xct.FILTERS)*len(xct.BINNINGS)*len(xct.DETECTORS),
+         lambda: xct_sweep.sweepPlans(table,main,fractions,100,diameters=[20]),None),
+        ('physics batched','sweep all diameters',xct_sweep.SWEEP_DIAMETERS.size*xct_sweep.SWEEP_THICKNESSES.size*xct_sweep.SWEEP_ENERGIES.size*len(xct.FILTERS)*len(xct.BINNINGS)*len(xct.DETECTORS),
+         lambda: xct_sweep.sweepPlans(table,main,fractions,100),None),
+        ('physics batched','batch manifest',len(manifest),lambda: xct_batch.planManifest(manifest,table,'2x','1920','Fe',0.05,160),None),
+        ('physics batched','contrast (cold)',xct_contrast.CONTRAST_ENERGIES.size*xct_sweep.SWEEP_THICKNESSES.size*len(xct.FILTERS),
+         lambda: xct_contrast.paretoFront(xct_contrast.contrastPlans(table,main,fractions,20,voxel,'2x','1920')),clearCaches),
+        ('physics batched','contrast',xct_contrast.CONTRAST_ENERGIES.size*xct_sweep.SWEEP_THICKNESSES.size*len(xct.FILTERS),
+         lambda: xct_contrast.paretoFront(xct_contrast.contrastPlans(table,main,fractions,20,voxel,'2x','1920')),None),
+        ('geometry','cylinder 512x512',xct_geometry.PIXELS**2,lambda: xct_geometry.cylinderPaths(20,20),None),
+        ('geometry','box 512x512 rotated',xct_geometry.PIXELS**2,lambda: xct_geometry.boxPaths(20,10,20,30),None),
+        ('geometry','transmission 512x512',xct_geometry.PIXELS**2,lambda: xct_geometry.geometryTransmission(table,main,fractions,cylinder,'Fe',0.05),None),
+        ('geometry','voxel mask 256^3',mask.size,lambda: xct_geometry.maskPaths(mask,80,{1:xct_geometry.SAMPLE,2:'Al'}),None),
+        ('geometry','voxel mask 256^3 rotated',mask.size,lambda: xct_geometry.maskPaths(mask,80,{1:xct_geometry.SAMPLE,2:'Al'},angle=30),None),
+        ('preview','slice 256 px, 180 projections',xct_preview.PREVIEW_ANGLES*256,
+         lambda: xct_preview.slicePreview(table,main,fractions,20,voxel,'Fe',0.05,160,workers=1),clearCaches),
+        ('preview','slice (cached)',1,lambda: xct_preview.slicePreview(table,main,fractions,20,voxel,'Fe',0.05,160,workers=1),None),
+        ('api','plans (cold)',len(requests),lambda: xct_api.Planner(table).plans(requests),None),
+        ('api','plans (cached)',len(requests),lambda: planner.plans(requests),None),
+        ('api','http requests (cached)',len(bodies),lambda: apiRequests(server,bodies),None),
+        ('charts','geometry (cold)',1,lambda: xct_charts.vsDiameterSpec(voxel,20,xct.SCANNER.calibration),clearCaches),
+        ('charts','geometry',1,lambda: xct_charts.vsDiameterSpec(voxel,20,xct.SCANNER.calibration),None),
+        ('charts','attenuation (cold)',1,lambda: xct_charts.attenuationSpec(curves),clearCaches),
+        ('charts','attenuation',1,lambda: xct_charts.attenuationSpec(curves),None),
+        ('charts','transmission',1,lambda: xct_charts.transmissionSpec(dfTransmission),None),
+        ('charts','spectrum',1,lambda: xct_charts.spectrumSpec(dfSpectrum),None),
+        ('charts','new phases',1,lambda: xct_charts.newPhasesSpec(table[['Energy (kV)']+phases[:3]].set_axis(['Energy (kV)','newPhase1','newPhase2','newPhase3'],axis=1),
+                                                                 ['newPhase1','newPhase2','newPhase3']),None),
+    ]
+
+def appReruns(repeat):
+    ########### first run (cold caches) and reruns of the whole app, time per section from the timing log
+    from streamlit.testing.v1 import AppTest
+    log=os.environ['XCT_TIMING_LOG']
+    if os.path.exists(log):
+        os.remove(log)
+    app=AppTest.from_file(APP,default_timeout=120)
+    for _ in range(repeat+1):
+        app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    runs=pd.read_json(log,lines=True).drop(columns='time')
+    return pd.DataFrame({'First run (ms)':runs.iloc[0],'Median rerun (ms)':runs.iloc[1:].median()}).round(1)
+
+def runBenchmarks(repeat=5,phases=40,only=None):
+    table=syntheticTable(phases)
+    xct_database.writeStore(table,source='benchmark')
+    rows=[]
+    for group,name,items,function,setup in benchmarks(table,list(table.columns[1:])):
+        if only and only not in group+' '+name:
+            continue
+        times,peak=measure(function,repeat,setup)
+        rows.append({'Group':group,'Benchmark':name,'Median (ms)':statistics.median(times)*1000,'Best (ms)':min(times)*1000,
+                     'Throughput (/s)':items/statistics.median(times),'Peak memory (Mb)':peak/1e6})
+    return pd.DataFrame(rows).round({'Median (ms)':3,'Best (ms)':3,'Throughput (/s)':0,'Peak memory (Mb)':2})
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Benchmarks of the XCT-Explorer planning pipeline (offline, synthetic data)')
+    parser.add_argument('--repeat',type=int,default=5,help='timed runs per benchmark')
+    parser.add_argument('--phases',type=int,default=40,help='phases of the synthetic attenuation table')
+    parser.add_argument('--only',help='run the benchmarks whose group or name contains this text')
+    parser.add_argument('--app',action='store_true',help='also time full reruns of the streamlit app')
+    parser.add_argument('--output',help='save the results as csv')
+    args=parser.parse_args(argv)
+    results=runBenchmarks(args.repeat,args.phases,args.only)
+    with pd.option_context('display.width',200,'display.max_rows',None):
+        print(results.to_string(index=False))
+        if args.app:
+            print('\nApp rerun (ms per section)')
+            print(appReruns(args.repeat).to_string())
+    if args.output:
+        results.to_csv(args.output,index=False)
+    return 0
+
+if __name__=='__main__':
+    sys.exit(main())
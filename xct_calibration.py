@@ -0,0 +1,99 @@
+#Scanner calibration: the coefficients of the voxel size and scan time equations are fitted with least squares to measured points
+#   voxel size = slope[binning,detector]*diameter + intercept[binning,detector]
+#   scan time  = (a*filterThickness + b*maximumEnergy + c*power + d)[binning] * cameraFactor[detector]
+#The fitted model is saved next to the attenuation database, keyed by the sha256 of the calibration files, so it is only fitted
+#again when the measured points change. To add a scanner or a detector width just add its points to the csv files
+import dataclasses
+import hashlib
+import json
+import os
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_database
+
+CALIBRATION_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)),'calibration')
+VOXEL_SIZE_FILE=os.path.join(CALIBRATION_DIR,'coretom_voxelsize.csv')
+TIME_FILE=os.path.join(CALIBRATION_DIR,'coretom_time.csv')
+DECIMALS=6        # the coefficients are rounded, the measurements are not more precise than that
+LABELS={'Binning':str,'Detector':str}
+
+@dataclasses.dataclass
+class Calibration:
+    ########### arrays are indexed [binning,detector] in the order of binnings and detectors
+    binnings: tuple
+    detectors: tuple
+    vsSlope: np.ndarray
+    vsIntercept: np.ndarray
+    diameterRange: np.ndarray        # [binning,detector,(min,max)] diameters (mm) of the calibration points
+    timeCoefficients: np.ndarray     # [binning,(filter thickness, energy, power, constant)]
+    cameraFactor: np.ndarray         # [detector], 1 for the reference detector of the time equation
+    key: str                         # sha256 of the calibration files
+
+    def toDict(self):
+        return {field.name:(value.tolist() if isinstance(value,np.ndarray) else value)
+                for field in dataclasses.fields(self) for value in [getattr(self,field.name)]}
+
+    @classmethod
+    def fromDict(cls,values):
+        return cls(**{name:(tuple(value) if name in ('binnings','detectors') else value if name=='key' else np.array(value,dtype=float))
+                      for name,value in values.items()})
+
+################################ Fit ################################
+def fitVoxelSize(points,binnings,detectors):
+    vsSlope,vsIntercept=np.full((len(binnings),len(detectors)),np.nan),np.full((len(binnings),len(detectors)),np.nan)
+    diameterRange=np.full((len(binnings),len(detectors),2),np.nan)
+    for (binning,detector),group in points.groupby(['Binning','Detector']):
+        b,d=binnings.index(binning),detectors.index(detector)
+        diameter=group['Diameter (mm)'].to_numpy(dtype=float)
+        vsSlope[b,d],vsIntercept[b,d]=np.polyfit(diameter,group['Voxel Size (um)'].to_numpy(dtype=float),1)
+        diameterRange[b,d]=diameter.min(),diameter.max()
+    return vsSlope,vsIntercept,diameterRange
+
+def fitTime(points,binnings,detectors):
+    ########### linear model per binning on the reference detector (the first one), then one factor per detector
+    reference=detectors[0]
+    timeCoefficients=np.full((len(binnings),4),np.nan)
+    for binning,group in points[points['Detector']==reference].groupby('Binning'):
+        design=np.column_stack([group['Filter Thickness (mm)'],group['Energy (kV)'],group['Power (W)'],np.ones(len(group))]).astype(float)
+        timeCoefficients[binnings.index(binning)]=np.linalg.lstsq(design,group['Scan Time (hrs)'].to_numpy(dtype=float),rcond=None)[0]
+    cameraFactor=np.ones(len(detectors))
+    for detector,group in points.groupby('Detector'):
+        coefficients=timeCoefficients[[binnings.index(binning) for binning in group['Binning']]]
+        model=(coefficients*np.column_stack([group['Filter Thickness (mm)'],group['Energy (kV)'],group['Power (W)'],np.ones(len(group))])).sum(axis=1)
+        time=group['Scan Time (hrs)'].to_numpy(dtype=float)
+        cameraFactor[detectors.index(detector)]=(time*model).sum()/(model*model).sum()     # least squares factor time = factor*model
+    return timeCoefficients,cameraFactor
+
+def fitCalibration(voxelSizePoints,timePoints,key=''):
+    binnings=tuple(sorted(set(voxelSizePoints['Binning'])|set(timePoints['Binning'])))
+    detectors=tuple(dict.fromkeys(list(timePoints['Detector'])+list(voxelSizePoints['Detector'])))    # in order of appearance
+    vsSlope,vsIntercept,diameterRange=fitVoxelSize(voxelSizePoints,binnings,detectors)
+    timeCoefficients,cameraFactor=fitTime(timePoints,binnings,detectors)
+    return Calibration(binnings,detectors,np.round(vsSlope,DECIMALS),np.round(vsIntercept,DECIMALS),diameterRange,
+                       np.round(timeCoefficients,DECIMALS),np.round(cameraFactor,DECIMALS),key)
+
+################################ Load ################################
+def calibrationKey(*paths):
+    sha=hashlib.sha256()
+    for path in paths:
+        sha.update(xct_database.fileChecksum(path).encode())
+    return sha.hexdigest()
+
+def loadCalibration(voxelSizeFile=VOXEL_SIZE_FILE,timeFile=TIME_FILE,cacheDir=xct_database.DATA_DIR):
+    ########### fitted once per set of calibration files, then read from the cache
+    key=calibrationKey(voxelSizeFile,timeFile)
+    cachePath=os.path.join(cacheDir,'calibration_%s.json'%key[:16])
+    if os.path.exists(cachePath):
+        with open(cachePath) as file:
+            values=json.load(file)
+        if values.get('key')==key:
+            return Calibration.fromDict(values)
+    calibration=fitCalibration(pd.read_csv(voxelSizeFile,dtype=LABELS),pd.read_csv(timeFile,dtype=LABELS),key)
+    try:
+        os.makedirs(cacheDir,exist_ok=True)
+        with open(cachePath+'.tmp','w') as file:
+            json.dump(calibration.toDict(),file)
+        os.replace(cachePath+'.tmp',cachePath)
+    except OSError:          # read-only deployment: the fit is cheap, keep going without the cache
+        pass
+    return calibration
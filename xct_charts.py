@@ -0,0 +1,134 @@
+#Vega-Lite specs of the plots, built from cached layers
+#alt.Chart.to_dict() validates the whole spec against the vega-lite schema and the data is serialized to arrow on every rerun,
+#which dominated the rerun time. Here every layer is converted once and kept with its data already serialized:
+#the calibration lines never change, the attenuation curve of a phase only changes with its data, and the marker
+#and transmission layers only send their (small) data again. The specs are drawn with st.vega_lite_chart
+import functools
+import hashlib
+import altair as alt            # 5.1.2
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import pyarrow as pa           # installed with streamlit
+
+ZOOM={'name':'zoom','select':{'type':'interval','encodings':['x','y']},'bind':'scales'}   # same as .interactive()
+
+def arrowBytes(dataframe):
+    ########### same format as the datasets serialized by st.altair_chart
+    table=pa.Table.from_pandas(dataframe,preserve_index=False)
+    sink=pa.BufferOutputStream()
+    with pa.RecordBatchStreamWriter(sink,table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def dataset(dataframe,prefix):
+    ########### named dataset keyed by its content, so the same data always gets the same name
+    data=arrowBytes(dataframe)
+    return prefix+'-'+hashlib.sha1(data).hexdigest()[:16],data
+
+def layerDict(chart):
+    spec=chart.to_dict()
+    for key in ('$schema','config','width','height'):
+        spec.pop(key,None)
+    return spec
+
+def chartSpec(layers,datasets=None,data=None,height=400,width='container',interactive=True):
+    ########### layers are shared by all reruns and must not be modified, only the outer dicts are new
+    layers=list(layers)
+    if interactive:
+        layers[0]=dict(layers[0],params=[ZOOM])
+    spec={'layer':layers,'height':height,'width':width}
+    if datasets:
+        spec['datasets']=dict(datasets)
+    if data is not None:
+        spec['data']={'name':data}
+    return spec
+
+############################## Geometric Parameters tab ##############################
+VS_COLORS=['#1f77b4','#17becf','#ffbb78','#ff7f0e','#98df8a','#2ca02c']   # one per binning x detector setting, repeated if there are more
+REGRESSION_CACHE={}      # calibration key -> (layer, datasets)
+
+def regressionLayer(calibration):
+    ########### one line per detector setting of the calibration, between the smallest and largest calibrated diameter
+    if calibration.key not in REGRESSION_CACHE:
+        lines=[]
+        for b,binning in enumerate(calibration.binnings):
+            for d,detector in enumerate(calibration.detectors):
+                diameters=calibration.diameterRange[b,d]
+                if not np.isnan(diameters).any():
+                    lines.append(pd.DataFrame({'Setting':'%s px, %s'%(detector,binning),'Diameter':diameters,
+                                               'VS':calibration.vsSlope[b,d]*diameters+calibration.vsIntercept[b,d]}))
+        lines=pd.concat(lines,ignore_index=True)
+        settings=list(dict.fromkeys(lines['Setting']))
+        name,data=dataset(lines,'regression')
+        layer=layerDict(alt.Chart(alt.Data(name=name)).mark_line(opacity=0.8).encode(
+                        x=alt.X('VS:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)'),
+                        color=alt.Color('Setting:N',legend=None).scale(domain=settings,range=[VS_COLORS[i%len(VS_COLORS)] for i in range(len(settings))]),
+                        tooltip=['Setting:N']))
+        REGRESSION_CACHE[calibration.key]=layer,{name:data}
+    return REGRESSION_CACHE[calibration.key]
+
+@functools.lru_cache(maxsize=None)
+def markTemplate():
+    return layerDict(alt.Chart(alt.Data(name='mark')).mark_point(color='red',size=120,fill='red').encode(
+                     x=alt.X('VS:Q',title='Voxel Size (µm)'),y=alt.Y('Diam:Q',title='Diameter (mm)')))
+
+def vsDiameterSpec(voxelSize,diameter,calibration):
+    ########### only the red dot changes between reruns, its single point is sent inline
+    layer,datasets=regressionLayer(calibration)
+    mark=dict(markTemplate(),data={'values':[{'VS':float(voxelSize),'Diam':float(diameter)}]})
+    return chartSpec([layer,mark],datasets,height=400,width=600,interactive=False)
+
+############################## Composition tab ##############################
+@functools.lru_cache(maxsize=64)
+def attenuationLayer(phase,color,energy,mu):
+    ########### energy and mu are passed as bytes so that the cache is keyed by the data, not only by the phase name
+    dataframe=pd.DataFrame({'Energy (kV)':np.frombuffer(energy),'mu':np.frombuffer(mu)})
+    name,data=dataset(dataframe,'attenuation')
+    layer=layerDict(alt.Chart(alt.Data(name=name)).mark_line(color=color).encode(
+                    x=alt.X('Energy (kV):Q').scale(domain=(10,180)),
+                    y=alt.Y('mu:Q',title='Attenuation Coefficient (cm-1)').scale(type='log'),
+                    tooltip=[alt.Tooltip('Energy (kV):Q'),alt.Tooltip('mu:Q',title=phase)]))
+    return layer,{name:data}
+
+def attenuationSpec(curves):
+    ########### curves: list of (phase, color, energy array, mu array)
+    layers,datasets=[],{}
+    for phase,color,energy,mu in curves:
+        layer,data=attenuationLayer(phase,color,np.asarray(energy,dtype=float).tobytes(),np.asarray(mu,dtype=float).tobytes())
+        layers.append(layer)
+        datasets.update(data)
+    return chartSpec(layers,datasets)
+
+@functools.lru_cache(maxsize=None)
+def lineTemplate(column,color,title,xDomain,yScale):
+    ########### line layer without data, the data is given at the top level of the spec
+    y=alt.Y(column+':Q',title=title)
+    if yScale=='log':
+        y=y.scale(type='log')
+    elif yScale is not None:
+        y=y.scale(domain=yScale)
+    return layerDict(alt.Chart().mark_line(color=color).encode(x=alt.X('Energy (kV):Q').scale(domain=xDomain),y=y))
+
+def linesSpec(dataframe,lines,title,xDomain,yScale,prefix):
+    ########### one dataset shared by several lines: lines is a list of (column, color)
+    name,data=dataset(dataframe,prefix)
+    return chartSpec([lineTemplate(column,color,title,xDomain,yScale) for column,color in lines],{name:data},data=name)
+
+def transmissionSpec(dfTransmission):
+    return linesSpec(dfTransmission,[('Sample','green'),('Filter+Sample','orange'),('Filter','lightblue')],
+                     'Total Transmission (%)',(20,180),(0,100),'transmission')
+
+def spectrumSpec(dfSpectrum):
+    return linesSpec(dfSpectrum,[('Tube','lightblue'),('Filter','orange'),('Filter+Sample','green')],
+                     'Relative Intensity',(10,180),None,'spectrum')
+
+def geometrySpec(dfGeometry):
+    return linesSpec(dfGeometry,[('Slab','lightblue'),('Mean','green'),('Minimum','red')],
+                     'Total Transmission (%)',(20,180),(0,100),'geometry')
+
+############################## Database tab ##############################
+def newPhasesSpec(dfNewPhases,newPhases):
+    ########### the table of the data editor can contain empty cells or text, those are not plotted
+    dataframe=dfNewPhases[['Energy (kV)']+list(newPhases)].apply(pd.to_numeric,errors='coerce')
+    return linesSpec(dataframe,[(phase,color) for phase,color in zip(newPhases,('lightblue','green','green'))],
+                     'Attenuation Coefficient (cm-1)',(10,180),'log','newphases')
@@ -0,0 +1,115 @@
+#Contrast between the phases of the sample for every Maximum Energy x filter x filter thickness, and the settings worth scanning with
+#   contrast  = |spectrum weighted (mu phase1 - mu phase2)| (cm-1), weighted by the signal reaching the detector behind the sample
+#   CNR proxy = contrast x sqrt(transmitted flux), the photon noise of the projections goes with 1/sqrt(detected photons)
+#The Pareto front trades contrast against scan time, the recommended setting is the one of the front with the best CNR proxy
+#The spectra behind every filter are computed once, and the contrast of a phase pair is kept in a cache keyed by the data of both phases
+#and by the sample, so reruns that do not change the composition or the diameter only look up the cache
+import hashlib
+import itertools
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_engine as xct
+import xct_spectrum
+import xct_sweep
+
+CONTRAST_ENERGIES=xct_sweep.SWEEP_ENERGIES[xct_sweep.SWEEP_ENERGIES>0]     # kV, same values as the slider
+FILTERED_CACHE={}        # (filters data, thicknesses, energies, step) -> (fine energies, tube spectra, spectra behind the filters)
+CONTRAST_CACHE={}        # (phase pair data, sample, grid) -> contrast [energy,filter,thickness]
+CACHE_SIZE=256
+FILTERED_CACHE_SIZE=4   # the full grid is a few tens of Mb, the current setting of the pair table a few kb
+
+def filteredSpectra(database,filters,thicknesses,energies,step=xct_spectrum.ENERGY_STEP):
+    ########### detected signal (photons x energy) behind every filter, shape (energy, filter, thickness, fine energies)
+    key=(tuple(xct_spectrum.columnKey(database,material) for material in filters),tuple(thicknesses),tuple(energies),step)
+    if key in FILTERED_CACHE:
+        FILTERED_CACHE[key]=FILTERED_CACHE.pop(key)        # most recently used last, so the full grid used every rerun is kept
+    else:
+        fine=xct_spectrum.fineAttenuation(database,filters[0],step)[0]
+        muFilters=np.stack([xct_spectrum.fineAttenuation(database,material,step)[1] for material in filters])
+        tube=np.stack([xct_spectrum.tubeSpectrum(fine,maximumEnergy)*fine for maximumEnergy in energies])
+        transmissionFilter=np.exp(-muFilters[:,None,:]*np.asarray(thicknesses,dtype=float)[None,:,None]/10)
+        if len(FILTERED_CACHE)>=FILTERED_CACHE_SIZE:
+            FILTERED_CACHE.pop(next(iter(FILTERED_CACHE)))
+        FILTERED_CACHE[key]=fine,tube,tube[:,None,None,:]*transmissionFilter[None],muFilters
+    return FILTERED_CACHE[key]
+
+def cached(key,compute):
+    if key not in CONTRAST_CACHE:
+        if len(CONTRAST_CACHE)>=CACHE_SIZE:
+            CONTRAST_CACHE.pop(next(iter(CONTRAST_CACHE)))      # oldest entry first
+        CONTRAST_CACHE[key]=compute()
+    return CONTRAST_CACHE[key]
+
+def contrastGrid(database,phases,fractions,diameter,filters=xct.FILTERS,thicknesses=xct_sweep.SWEEP_THICKNESSES,energies=CONTRAST_ENERGIES,
+                 step=xct_spectrum.ENERGY_STEP):
+    ########### arrays indexed [energy,filter,thickness], contrast has one more leading axis for the phase pairs
+    fine,tube,spectra,muFilters=filteredSpectra(database,tuple(filters),tuple(thicknesses),tuple(energies),step)
+    muSample=np.broadcast_to(xct_spectrum.sampleAttenuation(database,phases,fractions,step),fine.shape)
+    transmissionSample=np.exp(-muSample*diameter/10)
+    gridKey=(tuple(xct_spectrum.columnKey(database,material) for material in filters),tuple(thicknesses),tuple(energies),step)
+    sampleKey=hashlib.sha1(transmissionSample.tobytes()).hexdigest()
+    detected=[]          # signal behind filter and sample, only computed if something is missing from the cache
+
+    def signal():
+        if not detected:
+            detected.append(spectra*transmissionSample)
+            detected.append(detected[0].sum(axis=-1))
+        return detected
+
+    def pairContrast(first,second):
+        delta=xct_spectrum.fineAttenuation(database,first,step)[1]-xct_spectrum.fineAttenuation(database,second,step)[1]
+        weighted,total=signal()
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return np.abs(weighted@delta)/total
+
+    def flux():
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return signal()[1]/tube.sum(axis=-1)[:,None,None]
+
+    pairs=list(itertools.combinations(phases,2))
+    contrast=np.stack([cached((xct_spectrum.columnKey(database,first),xct_spectrum.columnKey(database,second),sampleKey,gridKey),
+                              lambda first=first,second=second: pairContrast(first,second))
+                       for first,second in pairs]) if pairs else np.full((0,)+spectra.shape[:3],np.nan)
+    ########### transmission at Emax as in the sweep, [energy,thickness] for every filter
+    energies=np.asarray(energies,dtype=float)[:,None]
+    transmission=np.stack([xct.transmissionAt(database,phases,fractions,diameter,material,np.asarray(thicknesses,dtype=float),energies)
+                           for material in filters],axis=1).reshape(spectra.shape[:3])
+    return {'pairs':pairs,'contrast':contrast,'flux':cached(('flux',sampleKey,gridKey),flux),'transmission':transmission}
+
+def pairTable(database,phases,fractions,diameter,filterMaterial,filterThickness,maximumEnergy):
+    ########### contrast of every pair of phases at the current settings
+    grid=contrastGrid(database,phases,fractions,diameter,filters=(filterMaterial,),thicknesses=(filterThickness,),energies=(maximumEnergy,))
+    return pd.DataFrame({'Phase 1':[first for first,_ in grid['pairs']],'Phase 2':[second for _,second in grid['pairs']],
+                         'Contrast (cm-1)':grid['contrast'][:,0,0,0],'CNR':grid['contrast'][:,0,0,0]*np.sqrt(grid['flux'][0,0,0])})
+
+def contrastPlans(database,phases,fractions,diameter,voxel,binning,detector,scanner=xct.SCANNER,minTransmission=xct_sweep.MIN_TRANSMISSION,
+                  filters=xct.FILTERS,thicknesses=xct_sweep.SWEEP_THICKNESSES,energies=CONTRAST_ENERGIES):
+    ########### one row per setting, scored by the pair of phases that is the hardest to tell apart
+    grid=contrastGrid(database,phases,fractions,diameter,filters,thicknesses,energies)
+    if not grid['pairs']:
+        return pd.DataFrame()
+    hardest=np.argmin(np.where(np.isnan(grid['contrast']),np.inf,grid['contrast']),axis=0)
+    contrast=np.take_along_axis(grid['contrast'],hardest[None],axis=0)[0]
+    time=xct.scanTime(voxel,binning,detector,np.asarray(thicknesses,dtype=float)[None,None,:],np.asarray(energies,dtype=float)[:,None,None],scanner)
+    shape=contrast.shape
+    e,f,t=np.unravel_index(np.arange(contrast.size),shape)
+    plans=pd.DataFrame({'Energy (kV)':np.asarray(energies)[e],'Filter':np.asarray(filters)[f],'Filter Thickness (mm)':np.asarray(thicknesses)[t],
+                        'Scan Time (hrs)':np.broadcast_to(time,shape).ravel(),'Transmission at Emax (%)':grid['transmission'].ravel(),
+                        'Hardest pair':[' / '.join(grid['pairs'][pair]) for pair in hardest.ravel()],
+                        'Contrast (cm-1)':contrast.ravel(),'CNR':(contrast*np.sqrt(grid['flux'])).ravel()})
+    return plans[(plans['Transmission at Emax (%)']>=minTransmission)&plans['CNR'].notna()].reset_index(drop=True)
+
+def paretoFront(plans):
+    ########### settings for which no other one is faster and has more contrast, fastest first (low kV: more contrast, longer scans)
+    if plans.empty:
+        return plans
+    plans=plans.sort_values(['Scan Time (hrs)','Contrast (cm-1)','CNR'],ascending=[True,False,False],kind='stable')
+    contrast=plans['Contrast (cm-1)'].to_numpy()
+    front=contrast>np.concatenate([[-np.inf],np.maximum.accumulate(contrast)[:-1]])
+    return plans[front].reset_index(drop=True)
+
+def recommendation(front):
+    ########### the setting of the front with the best CNR proxy, None if no setting has enough transmission
+    if front.empty:
+        return None
+    return front.loc[front['CNR'].idxmax()]
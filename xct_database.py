@@ -0,0 +1,180 @@
+#Local attenuation database: one float64 matrix (energy + one column per phase) saved as .npy and loaded as a read-only memory map
+#A json manifest next to it keeps the phase names, the format version and the sha256 of the matrix, which is checked on load
+#The store is filled once from a csv or the google sheet with:   python xct_database.py import --csv phases.csv   (or --sheet)
+#Csv files uploaded in the app with new phases are parsed once as float64, validated and resampled onto the energies of the store
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+
+STORE_VERSION=1
+ENERGY='Energy (kV)'
+DATA_DIR=os.environ.get('XCT_DATA_DIR',os.path.join(os.path.dirname(os.path.abspath(__file__)),'data'))
+SECRETS=os.path.join(os.path.dirname(os.path.abspath(__file__)),'secrets.toml')
+UPLOAD_CACHE={}          # (sha256 of the uploaded file, hash of the energies of the store) -> cleaned table
+UPLOAD_CACHE_SIZE=16
+
+def storePaths(dataDir=DATA_DIR):
+    name=os.path.join(dataDir,'attenuation_v%d'%STORE_VERSION)
+    return name+'.npy',name+'.json'
+
+def fileChecksum(path):
+    sha=hashlib.sha256()
+    with open(path,'rb') as file:
+        for block in iter(lambda: file.read(1<<20),b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+################################ Write ################################
+def writeStore(table,dataDir=DATA_DIR,source=''):
+    ########### table: dataframe with the energy column and one column of attenuation coefficients (cm-1) per phase
+    if ENERGY not in table.columns:
+        raise ValueError('the table has no "%s" column'%ENERGY)
+    phases=[column for column in table.columns if column!=ENERGY]
+    matrix=np.ascontiguousarray(table[[ENERGY]+phases].to_numpy(dtype=np.float64))
+    arrayPath,manifestPath=storePaths(dataDir)
+    os.makedirs(dataDir,exist_ok=True)
+    ########### written to temporary files and renamed, so a running app never sees half a store
+    with open(arrayPath+'.tmp','wb') as file:
+        np.save(file,matrix)
+    manifest={'version':STORE_VERSION,'phases':phases,'rows':matrix.shape[0],'sha256':fileChecksum(arrayPath+'.tmp'),
+              'source':source,'created':datetime.datetime.now().isoformat(timespec='seconds')}
+    with open(manifestPath+'.tmp','w') as file:
+        json.dump(manifest,file,indent=1)
+    os.replace(arrayPath+'.tmp',arrayPath)
+    os.replace(manifestPath+'.tmp',manifestPath)
+    return manifest
+
+################################ Read ################################
+def readManifest(dataDir=DATA_DIR):
+    arrayPath,manifestPath=storePaths(dataDir)
+    if not (os.path.exists(arrayPath) and os.path.exists(manifestPath)):
+        raise FileNotFoundError('no attenuation store version %d in %s, run: python xct_database.py import --csv <file>'%(STORE_VERSION,dataDir))
+    with open(manifestPath) as file:
+        manifest=json.load(file)
+    if manifest.get('version')!=STORE_VERSION:
+        raise ValueError('attenuation store %s has version %s, expected %d'%(manifestPath,manifest.get('version'),STORE_VERSION))
+    return manifest
+
+def loadStore(dataDir=DATA_DIR,verify=True):
+    ########### dataframe backed by a read-only memory map: processes loading the same store share the pages of the file
+    manifest=readManifest(dataDir)
+    arrayPath,_=storePaths(dataDir)
+    if verify and fileChecksum(arrayPath)!=manifest['sha256']:
+        raise ValueError('checksum of %s does not match its manifest, import the database again'%arrayPath)
+    matrix=np.load(arrayPath,mmap_mode='r')
+    return pd.DataFrame(matrix,columns=[ENERGY]+manifest['phases'],copy=False)
+
+################################ Uploads ################################
+def parseUpload(data):
+    ########### csv bytes -> float64 table, every cell must be a number or empty (nan)
+    names=pd.read_csv(io.BytesIO(data),header=None,nrows=1,dtype=str).iloc[0].str.strip().tolist()
+    duplicated=sorted({name for name in names if names.count(name)>1})
+    if duplicated:
+        raise ValueError('repeated columns: %s'%', '.join(duplicated))
+    try:
+        table=pd.read_csv(io.BytesIO(data),dtype=np.float64,index_col=False)
+    except ValueError as error:
+        raise ValueError('every cell must be a number (%s)'%error) from None
+    table.columns=names
+    return table
+
+def validateUpload(table,reserved=()):
+    ########### energies strictly increasing, attenuation coefficients positive, row numbers as in the file (header = row 1)
+    if ENERGY not in table.columns:
+        raise ValueError('the file has no "%s" column'%ENERGY)
+    phases=[column for column in table.columns if column!=ENERGY]
+    if not phases:
+        raise ValueError('the file has no phase columns')
+    clashes=[phase for phase in phases if phase in reserved]
+    if clashes:
+        raise ValueError('phases already in the database, rename them: %s'%', '.join(clashes))
+    if len(table)<2:
+        raise ValueError('the file needs at least two rows of energies below the header')
+    energies=table[ENERGY].to_numpy()
+    mu=table[phases].to_numpy()
+    missing=np.flatnonzero(np.isnan(energies))
+    if missing.size:
+        raise ValueError('row %d has no energy'%(missing[0]+2))
+    unsorted=np.flatnonzero(np.diff(energies)<=0)
+    if unsorted.size:
+        raise ValueError('energies must increase from row to row, see row %d (%g kV after %g kV)'%(unsorted[0]+3,energies[unsorted[0]+1],energies[unsorted[0]]))
+    if energies[0]<=0:
+        raise ValueError('energies must be positive')
+    row,column=np.nonzero(mu<=0)
+    if row.size:
+        raise ValueError('attenuation coefficients must be positive, see %s at row %d'%(phases[column[0]],row[0]+2))
+    sparse=[phase for phase,count in zip(phases,(~np.isnan(mu)).sum(axis=0)) if count<2]
+    if sparse:
+        raise ValueError('phases need at least two values: %s'%', '.join(sparse))
+
+def resampleUpload(table,energies):
+    ########### log-log interpolation of every phase at the energies of the store, nan outside the energies of each phase
+    phases=[column for column in table.columns if column!=ENERGY]
+    logEnergies,logGrid=np.log(table[ENERGY].to_numpy()),np.log(np.asarray(energies,dtype=float))
+    logMu=np.log(table[phases].to_numpy())
+    ########### phases without empty cells share the interpolation weights and are done as one matrix
+    right=np.clip(np.searchsorted(logEnergies,logGrid),1,len(logEnergies)-1)
+    weight=((logGrid-logEnergies[right-1])/(logEnergies[right]-logEnergies[right-1]))[:,None]
+    resampled=np.exp(logMu[right-1]*(1-weight)+logMu[right]*weight)
+    resampled[(logGrid<logEnergies[0])|(logGrid>logEnergies[-1])]=np.nan
+    for column in np.flatnonzero(np.isnan(logMu).any(axis=0)):
+        valid=~np.isnan(logMu[:,column])
+        resampled[:,column]=np.exp(np.interp(logGrid,logEnergies[valid],logMu[valid,column],left=np.nan,right=np.nan))
+    return pd.DataFrame(np.column_stack([energies,resampled]),columns=[ENERGY]+phases)
+
+def ingestUpload(data,energies,reserved=()):
+    ########### cleaned float64 table of an uploaded csv (bytes), parsed once per file content, raises ValueError if the file is not valid
+    energies=np.asarray(energies,dtype=float)
+    key=(hashlib.sha256(data).hexdigest(),hashlib.sha1(energies.tobytes()).hexdigest(),tuple(reserved))
+    if key not in UPLOAD_CACHE:
+        table=parseUpload(data)
+        validateUpload(table,reserved)
+        if len(UPLOAD_CACHE)>=UPLOAD_CACHE_SIZE:
+            UPLOAD_CACHE.pop(next(iter(UPLOAD_CACHE)))
+        UPLOAD_CACHE[key]=resampleUpload(table,energies)
+    return UPLOAD_CACHE[key]
+
+################################ Import ################################
+def sheetCsvUrl(url):
+    ########### export link of a google sheet shared with "anyone with the link"
+    return url.split('/edit')[0]+'/export?format=csv'
+
+def readSheet(url=None,secrets=SECRETS):
+    if url is None:            # same spreadsheet as the st.connection("gsheets") of the app
+        try:
+            import tomllib            # python >= 3.11
+        except ModuleNotFoundError:
+            import tomli as tomllib   # same api, see requirements.txt
+        with open(secrets,'rb') as file:
+            url=tomllib.load(file)['connections']['gsheets']['spreadsheet']
+    return pd.read_csv(sheetCsvUrl(url)),url
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Local attenuation database of the XCT-Explorer')
+    commands=parser.add_subparsers(dest='command',required=True)
+    importCommand=commands.add_parser('import',help='import or refresh the store from a csv file or the google sheet')
+    source=importCommand.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv',help='csv file with an "%s" column and one column per phase'%ENERGY)
+    source.add_argument('--sheet',nargs='?',const='',help='google sheet url (default: the spreadsheet of secrets.toml)')
+    commands.add_parser('info',help='show the manifest and check the checksum')
+    parser.add_argument('--data-dir',default=DATA_DIR)
+    args=parser.parse_args(argv)
+    if args.command=='import':
+        if args.csv:
+            table,source=pd.read_csv(args.csv),os.path.abspath(args.csv)
+        else:
+            table,source=readSheet(args.sheet or None)
+        manifest=writeStore(table,args.data_dir,source)
+        print('imported %d phases x %d energies from %s'%(len(manifest['phases']),manifest['rows'],source))
+    else:
+        table=loadStore(args.data_dir)
+        print(json.dumps(readManifest(args.data_dir),indent=1))
+        print('checksum ok, %d phases x %d energies'%(table.shape[1]-1,table.shape[0]))
+
+if __name__=='__main__':
+    main()
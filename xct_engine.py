@@ -0,0 +1,126 @@
+#Physics core of the XCT-Explorer: voxel size, data size, minimum feature, transmission and scan time
+#It only needs numpy and pandas (no streamlit), so a scan plan can be evaluated from scripts, batch jobs and tests
+import dataclasses
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_scanners
+
+PURPOSES=('Qualitative','Quantify','Classify')
+PURPOSE_FACTOR=np.array([3,5,7])     # minimum feature = voxel size x factor
+FILTERS=('Cu','Fe','Al','Quartz','Polystyrene')
+MINIMUM_VOXEL=1          # um, the calibration lines drop below 1 um for diameters of 0-1 mm
+
+########### everything that is specific of a scanner configuration is in its profile, see scanners/ and xct_scanners.py
+#the functions below take the compiled profile of the scanner, by default the CoreTOM from Tescan
+SCANNERS=xct_scanners.loadScanners()
+SCANNER=SCANNERS[xct_scanners.DEFAULT_SCANNER]
+BINNINGS=SCANNER.binnings
+DETECTORS=SCANNER.detectors
+
+@dataclasses.dataclass
+class ScanPlan:
+    ########### plain description of a scan plan, the defaults are the defaults of the app
+    diameter: float = 20                 # mm
+    purpose: str = 'Qualitative'
+    binning: str = '2x'
+    detector: str = '1920'
+    scanner: str = xct_scanners.DEFAULT_SCANNER
+    phases: tuple = ()
+    fractions: tuple = ()                # volume fraction of each phase (0-1)
+    filterMaterial: str = 'Fe'
+    filterThickness: float = 0.05        # mm
+    maximumEnergy: float = 160           # kV
+    numberOfScans: int = 1
+
+def settingIndex(setting,labels):
+    ########### the functions below accept a label ('2x', '1920', 'Quantify') or an array of indices into the label tuple
+    if isinstance(setting,str):
+        return labels.index(setting)
+    return np.asarray(setting)
+
+def setting(scanner,field,binning,detector):
+    ########### value of the binning x detector setting: one lookup in the compiled table for labels, array indexing for index arrays
+    if isinstance(binning,str) and isinstance(detector,str):
+        return getattr(scanner.table[(binning,detector)],field)
+    return scanner.arrays[field][settingIndex(binning,scanner.binnings),settingIndex(detector,scanner.detectors)]
+
+def asScalar(value):
+    ########### 0-d results are returned as python numbers, as used by the app
+    return value.item() if np.ndim(value)==0 and hasattr(value,'item') else value
+
+################################ Geometric parameters ################################
+def voxelSize(diameter,binning,detector,scanner=SCANNER):
+    ########### linear calibration truncated to whole um, never below MINIMUM_VOXEL
+    return asScalar(np.maximum(np.trunc(setting(scanner,'vsSlope',binning,detector)*diameter+setting(scanner,'vsIntercept',binning,detector)).astype(int),MINIMUM_VOXEL))
+
+def dataSize(binning,detector,scanner=SCANNER):
+    return asScalar(setting(scanner,'dataSize',binning,detector))
+
+def projectionPixels(binning,detector,scanner=SCANNER):
+    ########### pixels across a projection: detector pixels of the profile divided by the binning factor
+    return asScalar(setting(scanner,'pixels',binning,detector))
+
+def minimumFeature(voxel,purpose):
+    return asScalar(voxel*PURPOSE_FACTOR[settingIndex(purpose,PURPOSES)])
+
+################################ Composition parameters ################################
+def attenuationMatrix(database,phases):
+    ########### (phases x energies) attenuation coefficients (cm-1), any number of phases
+    return database[list(phases)].to_numpy(dtype=float).T.reshape(len(phases),len(database))
+
+def sampleAttenuation(database,phases,fractions):
+    ########### mean attenuation coefficient of the sample along one ray: fractions . (phases x energies)
+    return np.asarray(fractions,dtype=float)@attenuationMatrix(database,phases)
+
+def transmission(database,phases,fractions,diameter,filterMaterial,filterThickness):
+    ########### Lambert-Beer law applied to the selected phases, volume fractions and sample diameter (mm, mu in cm-1)
+    energy=database['Energy (kV)'].to_numpy(dtype=float)
+    totalTransm=np.exp(-sampleAttenuation(database,phases,fractions)*diameter/10)*100
+    transmFilter=np.exp(-database[filterMaterial].to_numpy(dtype=float)*filterThickness/10)*100
+    totalTransmFilter=totalTransm*transmFilter/100
+    return pd.DataFrame({'Energy (kV)':energy,'Sample':totalTransm,'Filter':transmFilter,'Filter+Sample':totalTransmFilter})
+
+def attenuationAt(database,column,energies):
+    ########### attenuation interpolated at the given energies, nan outside the energy range of the table
+    return np.interp(energies,database['Energy (kV)'].to_numpy(dtype=float),database[column].to_numpy(dtype=float),left=np.nan,right=np.nan)
+
+def transmissionAt(database,phases,fractions,diameter,filterMaterial,filterThickness,energies):
+    ########### Lambert-Beer law (%) through filter and sample at the given energies (e.g. Emax), nan outside the energies of the table
+    ########### fractions: (phases) or (samples x phases); the sample, diameter, filterThickness and energies arrays broadcast together
+    energies=np.asarray(energies,dtype=float)
+    mu=np.array([attenuationAt(database,phase,energies) for phase in phases]).reshape((len(phases),)+energies.shape)
+    muSample=np.tensordot(np.asarray(fractions,dtype=float),mu,axes=([-1],[0]))
+    muFilter=attenuationAt(database,filterMaterial,energies)
+    return asScalar(np.exp(-muSample*np.asarray(diameter)/10)*np.exp(-muFilter*np.asarray(filterThickness)/10)*100)
+
+################################ Time ################################
+def scanPower(voxel,scanner=SCANNER):
+    return asScalar(np.maximum(voxel,scanner.minimumPower))
+
+def scanTime(voxel,binning,detector,filterThickness,maximumEnergy,scanner=SCANNER):
+    ########### empirical time equation per binning: time = (a*filterThickness + b*maximumEnergy + c*power + d)*cameraFactor
+    a,e,p,c=np.moveaxis(np.asarray(setting(scanner,'timeCoefficients',binning,detector)),-1,0)
+    time=np.round((a*filterThickness+e*maximumEnergy+p*scanPower(voxel,scanner)+c)*setting(scanner,'cameraFactor',binning,detector),1)
+    return asScalar(np.maximum(time,scanner.minimumScanTime))
+
+def experimentTime(time,numberOfScans,scanner=SCANNER):
+    return asScalar(np.round((np.asarray(time)+scanner.setupTime)*numberOfScans,1))
+
+def isLongScan(time,binning,detector,scanner=SCANNER):
+    return asScalar(time>setting(scanner,'redTime',binning,detector))
+
+################################ Full plan ################################
+def evaluatePlan(plan,database=None):
+    ########### returns all the parameters of the Summary tab. The transmission table is only computed if a database is given
+    scanner=SCANNERS[plan.scanner]
+    voxel=voxelSize(plan.diameter,plan.binning,plan.detector,scanner)
+    time=scanTime(voxel,plan.binning,plan.detector,plan.filterThickness,plan.maximumEnergy,scanner)
+    result={'voxelSize':voxel,
+            'dataSize':dataSize(plan.binning,plan.detector,scanner),
+            'minimumFeature':minimumFeature(voxel,plan.purpose),
+            'scanTime':time,
+            'experimentTime':experimentTime(time,plan.numberOfScans,scanner),
+            'longScan':isLongScan(time,plan.binning,plan.detector,scanner)}
+    if database is not None:
+        result['transmission']=transmission(database,plan.phases,plan.fractions,plan.diameter,plan.filterMaterial,plan.filterThickness)
+    return result
@@ -2,13 +2,22 @@
 import numpy as np            # <2      #Note that the update V2 released June2024 is incompatible
 import pandas as pd            # 1.5.3
 import streamlit as st          # 1.36.0  #Note that 1.37.0 is incompatible
-import altair as alt            # 5.1.2
-from streamlit_gsheets import GSheetsConnection   # 0.0.4
+import xct_engine as xct      # physics core, no streamlit
+import xct_database
+import xct_sweep
+import xct_spectrum
+import xct_charts
+import xct_contrast
+import xct_geometry
+import xct_preview
+import xct_timing
+import xct_batch
 
 ##### update Sep2024: estetic improvements, typo corrections, new tab to create new phases with option to load it
 
 st.set_page_config(layout='wide',page_title='XCT-Explorer-Advanced v130924')
-tabCitation, tabInstructions, tabGeometry, tabComposition, tabDatabase, tabSummary= st.tabs(['Disclosure','Instructions',':blue[Geometric Parameters]',':violet[Composition Parameters]','Database','Summary'])
+timings=xct_timing.Timings()     # per rerun time of each section, shown with ?timing=1
+tabCitation, tabInstructions, tabGeometry, tabComposition, tabDatabase, tabSummary, tabSweep, tabBatch, tabPreview= st.tabs(['Disclosure','Instructions',':blue[Geometric Parameters]',':violet[Composition Parameters]','Database','Summary','Sweep','Batch','Preview'])
 
 with tabCitation:
     st.write('The XCT-Explorer-Advanced is a graphic user interface designed to be an intuitive and interactive tool to help planning CT experiments. New users are advised to use the simplified version of this app https://xct-explorer-v1.streamlit.app/. Note that the advanced features are experimental')
@@ -28,8 +37,8 @@ with tabInstructions:
     st.write(' -	If “Minimum Feature Size” is larger than your expectation consider: 1) Increase detector width; 2) Decrease Binning; 3) Decrease Sample Diameter') 
     st.write('**Tip:** Different combinations of binning and detector size may give the same voxel size. In this case choose the combination with higher binning as that reduces the scan time and the data size')
     st.write(' **Step 2: Define the :violet[Composition] of the sample**')
-    st.write('-	Select up to 4 of the most relevant Phases in the sample')
-    st.write('**Tip:** if the phase is not in the database go to the Database tab and add the attenuation coefficients to the table (or load from csv). Go back to the Composition tab and select newPhase 1-3 at the end of the dropdown menu. Add at least 4 values between 40-200kV')
+    st.write('-	Select the most relevant Phases in the sample (any number)')
+    st.write('**Tip:** if the phase is not in the database go to the Database tab and add the attenuation coefficients to the table (or load from csv). Go back to the Composition tab and select newPhase 1-3 at the end of the phase list. Add at least 4 values between 40-200kV')
     st.write('-	Input the approximate Volume Fraction for each phase')
     st.write('**Step 3: Tune the X-ray spectra**')
     st.write('-	Select an available filter')
@@ -47,18 +56,21 @@ with tabInstructions:
     st.write('Note 3: consider the Experiment Time is just a rough approximation')
     st.write('**Tip:** data in tables can be saved as csv and plots can be saved as image or Jason and can be edited in Vega')
 
-@st.cache_data # Currently is using a database uploaded in google sheets. the scanner specific settings could also be loaded 
+@st.cache_resource # one read-only copy of the local database (memory map) shared by all sessions, see xct_database.py
 def loadDatabase():
-    #url= "https://docs.google.com/spreadsheets/d/1t8-3UUnGjH2Nv7vF2iHoj5NkEFeWftml9qhTTv3fE4A/edit?usp=sharing"
-    # Create a connection object.
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    phaseData = conn.read()       #if specific url is used (spreadsheet=url)
-    return phaseData
-database=loadDatabase()
-allPhases= database.columns.values.tolist()
-newPhases=['newPhase1','newPhase2','newPhase3']
-allPhases.extend(newPhases)
-allPhases.remove('Energy (kV)')
+    try:
+        return xct_database.loadStore()
+    except FileNotFoundError:
+        ########### first start without a local database: fetch the google sheet once and keep it on disk
+        from streamlit_gsheets import GSheetsConnection   # 0.0.4
+        #url= "https://docs.google.com/spreadsheets/d/1t8-3UUnGjH2Nv7vF2iHoj5NkEFeWftml9qhTTv3fE4A/edit?usp=sharing"
+        conn = st.connection("gsheets", type=GSheetsConnection)
+        phaseData = conn.read()       #if specific url is used (spreadsheet=url)
+        xct_database.writeStore(phaseData,source='gsheets')
+        return xct_database.loadStore()
+with timings.section('Database'):
+    database=loadDatabase()
+newPhases=['newPhase1','newPhase2','newPhase3']      # replaced by the phases of the file uploaded in the Database tab
 
 ############################################## state variables ######################################################    
 if 'diameter' not in st.session_state:
@@ -77,140 +89,65 @@ st.sidebar.title(':blue[Resolution]', help='_"Resolution is not a value but more
 
 ########################################## Define voxel size vs diameter #################################################
 def vs_diameter():
-    ########### this is specific of a scanner configuration ### linear equation based on 1920px width (bin1)
-    diameters=(12,40,150)                    # diameters 
-    VS_1920Bin1=np.array([6,22,83])          # VS for the given diameters. All other correlations are calculated relative to this
-    VS_2856Bin1=VS_1920Bin1*2/3
-    VS_1920Bin2=VS_1920Bin1*2
-    VS_2856Bin2=VS_1920Bin1*2/3*2
-    VS_1920Bin3=VS_1920Bin1*3
-    VS_2856Bin3=VS_1920Bin1*2/3*3          # this is the same as VS_1920Bin2, so only 5 lines are actually visible in the plot
-    ############################# plots ################################
-    RegressionData=pd.DataFrame({'Diameter':diameters,'VS_1920Bin1':VS_1920Bin1,'VS_2856Bin1':VS_2856Bin1,'VS_1920Bin2':VS_1920Bin2,'VS_2856Bin2':VS_2856Bin2,'VS_1920Bin3':VS_1920Bin3,'VS_2856Bin3':VS_2856Bin3})
-    plotVS_Diam2856B1 = alt.Chart(RegressionData,height=400, width=600).mark_point().encode(x=alt.X('VS_2856Bin1:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_2856Bin1', 'Diameter').mark_line(color='#17becf',opacity=0.8)
-    plotVS_Diam1920B1 = alt.Chart(RegressionData,height=400, width=600).mark_point().encode(x=alt.X('VS_1920Bin1:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_1920Bin1', 'Diameter').mark_line(color='#1f77b4',opacity=0.8)
-    plotVS_Diam2856B2 = alt.Chart(RegressionData,height=400,width=600).mark_point().encode(x=alt.X('VS_2856Bin2:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_2856Bin2', 'Diameter').mark_line(color='#ff7f0e',opacity=0.8)
-    plotVS_Diam1920B2 = alt.Chart(RegressionData,height=400,width=600).mark_point().encode(x=alt.X('VS_1920Bin2:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_1920Bin2', 'Diameter').mark_line(color='#ffbb78',opacity=0.8)
-    plotVS_Diam2856B3 = alt.Chart(RegressionData,height=400,width=600).mark_point().encode(x=alt.X('VS_2856Bin3:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_2856Bin3', 'Diameter').mark_line(color='#2ca02c',opacity=0.8)
-    plotVS_Diam1920B3 = alt.Chart(RegressionData,height=400,width=600).mark_point().encode(x=alt.X('VS_1920Bin3:Q',title='Voxel Size (µm)'),y=alt.Y('Diameter:Q',title='Diameter (mm)')).transform_regression('VS_1920Bin3', 'Diameter').mark_line(color='#98df8a',opacity=0.8)
-    plot=plotVS_Diam2856B1 + plotVS_Diam1920B1 +plotVS_Diam2856B2 + plotVS_Diam1920B2 + plotVS_Diam2856B3 + plotVS_Diam1920B3
-    if radio3=='1x' and radio4=='1920':
-       st.session_state['voxelSize']=int(0.5627*st.session_state['diameter']-0.5293)             #linear correlations ######## in the future the coeficients could be calculated automatically using scipy
-       markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})   # Red Dot in the plot, coordinates along respective line
-       st.session_state['DataSize']=11
-    if radio3=='1x' and radio4=='2856':
-       st.session_state['voxelSize']=int(0.3626*st.session_state['diameter']+0.0151)
-       markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})
-       st.session_state['DataSize']=32
-    if radio3=='2x' and radio4=='1920':
-       st.session_state['voxelSize']=int(1.1254*st.session_state['diameter'] -1.0585)       
-       markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})
-       st.session_state['DataSize']=1.4
-    if radio3=='2x' and radio4=='2856':
-       st.session_state['voxelSize']=int(0.7236*st.session_state['diameter']+0.4404)       
-       markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})
-       st.session_state['DataSize']=4.3
-    if radio3=='3x' and radio4=='1920':
-       st.session_state['voxelSize']=int(1.6881*st.session_state['diameter']-1.5878)
-       markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})
-       st.session_state['DataSize']=0.4
-    if radio3=='3x' and radio4=='2856':
-        st.session_state['voxelSize']=int(1.1254*st.session_state['diameter']-1.0585)        
-        markPoint=pd.DataFrame({'VS':[st.session_state['voxelSize']],'Diam':[st.session_state['diameter']]})
-        st.session_state['DataSize']=1.2
-    plotMark = alt.Chart(markPoint,height=400,width=600).mark_point(color='red',size=120,fill='red').encode(x=alt.X('VS:Q',title='Voxel Size (µm)'),y=alt.Y('Diam:Q',title='Diameter (mm)'))
-    plotAndMark=plot+plotMark
-    st.altair_chart(plotAndMark,use_container_width=False)  
+    st.session_state['voxelSize']=xct.voxelSize(st.session_state['diameter'],radio3,radio4,scanner)    #linear correlations, see xct_engine.py
+    st.session_state['DataSize']=xct.dataSize(radio3,radio4,scanner)
+    ############################# plots: the calibration lines are cached, only the red dot is sent again ################################
+    st.vega_lite_chart(xct_charts.vsDiameterSpec(st.session_state['voxelSize'],st.session_state['diameter'],scanner.calibration),use_container_width=False)
 
 ############## Plot Attenuation curves in the Composition Tab ###############################     
 def attenuation_energy():
-    if menuPhase1 == 'newPhase1':
-        plot1= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='lightblue').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase1:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()
-    else:
-        plot1= alt.Chart(database,width='container',height=400).mark_line(color='lightblue').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y(menuPhase1,title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()
-    if menuPhase2 == 'newPhase2':
-        plot2= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase2:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()        
-    else:
-        plot2= alt.Chart(database,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y(menuPhase2,title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()
-    if menuPhase3 == 'newPhase3':
-        plot3= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase3:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()        
-    else:
-        plot3= alt.Chart(database,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y(menuPhase3,title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()    
-    plot4= alt.Chart(database,width='container',height=400).mark_line(color='red').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y(menuPhase4,title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()  
-    plot=plot1 + plot2 + plot3 + plot4      
-    st.altair_chart(plot,use_container_width=True)
+    ########### one cached layer per phase, keyed by the phase and its data
+    if not menuPhases:
+        st.info('Select at least one phase')
+        return
+    table=phaseTable()
+    curves=[(phase,phaseColor(i),table['Energy (kV)'],table[phase]) for i,phase in enumerate(menuPhases)]
+    st.vega_lite_chart(xct_charts.attenuationSpec(curves),use_container_width=True)
+
+PHASE_COLORS=['blue','green','orange','red','violet','gray']     # colors available in streamlit labels, repeated if more phases
+def phaseColor(i):
+    return PHASE_COLORS[i%len(PHASE_COLORS)]
+
+def phaseTable():
+    ########### database with the new phases of the table in the Database tab, built once per rerun
+    return dfPhases
+
 def transmission():
     ########### Lambert-Beer law applied to the seleted phases, volume fractions and sample diameter
-    if menuPhase1 == 'newPhase1':
-        attPhase1=newDatabase2[menuPhase1]
-        attPhase1=attPhase1.astype(float)
-        energy= newDatabase2['Energy (kV)']
-        energy=energy.astype(float)
-    else:
-        attPhase1= database[menuPhase1]
-        energy= database['Energy (kV)']
-    transm1=np.exp(-attPhase1*inFracPhase1*slideDiameter/10)
-    if menuPhase2 == 'newPhase2':
-        attPhase2=newDatabase2[menuPhase2]
-        attPhase2=attPhase2.astype(float)
-        energy= newDatabase2['Energy (kV)']
-        energy=energy.astype(float)
-    else:
-        attPhase2= database[menuPhase2]
-        energy= database['Energy (kV)']
-    transm2=np.exp(-attPhase2*inFracPhase2*slideDiameter/10)
-    if menuPhase3 == 'newPhase3':
-        attPhase3=newDatabase2[menuPhase3]
-        attPhase3=attPhase3.astype(float)
-        energy= newDatabase2['Energy (kV)']
-        energy=energy.astype(float)
-    else:
-        attPhase3= database[menuPhase3]
-        energy= database['Energy (kV)']
-    transm3=np.exp(-attPhase3*inFracPhase3*slideDiameter/10)
-    attPhase4= database[menuPhase4]
-    transm4=np.exp(-attPhase4*inFracPhase4*slideDiameter/10)
-    totalTransm=transm1*transm2*transm3*transm4*100
-
-    ########################### Filter #############################################
-    attFilter= database[menuFilter]
-    transmFilter=np.exp(-attFilter*st.session_state['filterThickness']/10)*100
-    totalTransmFilter=totalTransm*transmFilter/100
+    dfTotalTransm4Plot=xct.transmission(phaseTable(),menuPhases,inFractions,
+                                        slideDiameter,menuFilter,st.session_state['filterThickness'])
 
     ###################### Plot total transmission ########################################
-    TotalTransm4Plot={'Energy (kV)':energy,'Sample':totalTransm,'Filter':transmFilter, 'Filter+Sample':totalTransmFilter}
-    dfTotalTransm4Plot=pd.DataFrame(TotalTransm4Plot)
-    plotSample= alt.Chart(dfTotalTransm4Plot,width='container',height=400
-                    ).mark_line(color='green').encode(x=alt.X('Energy (kV):Q').scale(domain=(20,180)),
-                                                            y=alt.Y('Sample',title='Total Transmission (%)').scale(domain=(0,100))).interactive()
-    plotSample_Filter=alt.Chart(dfTotalTransm4Plot,width='container',height=400
-                    ).mark_line(color='orange').encode(x=alt.X('Energy (kV):Q').scale(domain=(20,180)),
-                                                            y=alt.Y('Filter+Sample',title='Total Transmission (%)').scale(domain=(0,100))).interactive()
-    plotFilter=alt.Chart(dfTotalTransm4Plot,width='container',height=400
-                ).mark_line(color='lightblue').encode(x=alt.X('Energy (kV):Q').scale(domain=(20,180)),
-                                                        y=alt.Y('Filter',title='Total Transmission (%)').scale(domain=(0,100))).interactive()
-    plot=plotSample+plotSample_Filter+plotFilter
-    st.altair_chart(plot,use_container_width=True)
+    st.vega_lite_chart(xct_charts.transmissionSpec(dfTotalTransm4Plot),use_container_width=True)
     return dfTotalTransm4Plot
 
+@st.cache_resource(max_entries=2) # a voxel mask is read and cast once per uploaded file, voxel size and angle
+def maskProjection(fileId,voxelSize,angle,_data):
+    return xct_geometry.maskPaths(xct_geometry.readMask(_data),voxelSize,angle=angle)
+
+def samplePaths(shape):
+    ########### path lengths of the rays of a projection through the sample, None if there is nothing to cast
+    if shape=='Cylinder':
+        return xct_geometry.cylinderPaths(slideDiameter,inShapeHeight)
+    if shape=='Sphere':
+        return xct_geometry.spherePaths(slideDiameter)
+    if shape=='Box':
+        return xct_geometry.boxPaths(slideDiameter,inShapeDepth,inShapeHeight,slideShapeAngle)
+    if shape=='Cylinder in tube':
+        return xct_geometry.tubePaths(slideDiameter,inShapeHeight,inWallThickness,menuContainer)
+    if uploadMask:
+        return maskProjection(uploadMask.file_id,inMaskVoxel,slideShapeAngle,uploadMask.getvalue())
+    return None
+
 ##################### Calculates the minimum feature of interest for the sidebar ############################
 def updateMinFeature():
-    if radio1=='Qualitative':
-        st.session_state['minimumFeature']=st.session_state['voxelSize']*3
-    if radio1=='Quantify':
-        st.session_state['minimumFeature']=st.session_state['voxelSize']*5
-    if radio1=='Classify':
-       st.session_state['minimumFeature']=st.session_state['voxelSize']*7
+    st.session_state['minimumFeature']=xct.minimumFeature(st.session_state['voxelSize'],radio1)
 
 ############################ Controls the display in the tab geometry ################################
 with tabGeometry:
+    menuScanner=st.selectbox(label='Scanner',options=list(xct.SCANNERS),index=list(xct.SCANNERS).index(xct.SCANNER.name),
+                             help='Each scanner has its own profile in the scanners folder (calibration, data size and time limits)')
+    scanner=xct.SCANNERS[menuScanner]
     colDiam, colPurpose, colBin,colCam = st.columns(4, gap='large')
     with colDiam:
         st.subheader('Sample Diameter (mm)')
@@ -221,13 +158,14 @@ with tabGeometry:
         radio1=st.radio(label='   ',options=['Qualitative','Quantify','Classify'], help='What kind of information do you need to answer your scientific question?')
     with colBin:
         st.subheader('Binning')
-        radio3=st.radio(label=' ',options=['1x','2x','3x'], help='2x is recommended. Higher binning decreases the scanning time, image artefacts and data size, but worsens voxel size',index=1)
+        radio3=st.radio(label=' ',options=scanner.binnings, help='2x is recommended. Higher binning decreases the scanning time, image artefacts and data size, but worsens voxel size',index=scanner.binnings.index(scanner.defaultBinning))
     with colCam:
         st.subheader('Detector width (px)')
-        radio4=st.radio(label=' ',options=['2856','1920'],index=1,help='"1920" recommended if very dense phases are present and if the purpose is "Quantify" or "Classify". Smaller detectors decrease cone beam artifacts. Note that other values are possible, the two options are just a guide')
+        radio4=st.radio(label=' ',options=scanner.detectors,index=scanner.detectors.index(scanner.defaultDetector),help='"1920" recommended if very dense phases are present and if the purpose is "Quantify" or "Classify". Smaller detectors decrease cone beam artifacts. Note that other values are possible, the two options are just a guide')
     st.divider()
     st.text('   ') #just some space
-    vs_diameter()
+    with timings.section('Geometry chart'):
+        vs_diameter()
     updateMinFeature()
     st.write(':grey[Each line represents a detector setting. The red dot highlights the selected setting]')
 
@@ -245,43 +183,43 @@ st.sidebar.metric(':blue[Data Size (Gb)]',st.session_state['DataSize'],
 with tabDatabase:
     st.header('Add new phases',help='Add consecutive values at least between 60 and 200 kV')
     colNewPhases,colPreviewPlot = st.columns(2)    
-    uploadDatabase=st.file_uploader(label='upload new phases')
-    with colNewPhases:    
+    uploadDatabase=st.file_uploader(label='upload new phases',help='csv with an "Energy (kV)" column (increasing) and one column of attenuation coefficients (cm-1) per phase, any number of phases')
+    with colNewPhases, timings.section('Data editor'):
+        newDatabase2=None
         if uploadDatabase:
-            newDatabase2=pd.read_csv(uploadDatabase, index_col=False)
-            newDatabase2=st.data_editor(newDatabase2, num_rows='dynamic', width=600, height=500)
-        else:
+            ########### parsed, checked and resampled onto the energies of the database once per file, see xct_database.py
+            try:
+                newDatabase2=xct_database.ingestUpload(uploadDatabase.getvalue(),database['Energy (kV)'],reserved=database.columns)
+            except ValueError as error:
+                st.error('The file was not loaded: %s'%error)
+            else:
+                newPhases=list(newDatabase2.columns[1:])
+                st.subheader('Uploaded phases (%d) at the energies of the database'%len(newPhases))
+                newDatabase2=st.data_editor(newDatabase2, num_rows='fixed', disabled=['Energy (kV)'], width=600, height=500)
+        if newDatabase2 is None:
             st.subheader('Input attenuation coefficients')
-            newDatabase=pd.DataFrame(columns=['Energy (kV)','newPhase1','newPhase2','newPhase3'],index=range(12))
+            newDatabase=pd.DataFrame(columns=['Energy (kV)','newPhase1','newPhase2','newPhase3'],index=range(12),dtype=float)
             newDatabase['Energy (kV)']=database['Energy (kV)']
             newDatabase2=st.data_editor(newDatabase, num_rows='dynamic', width=600, height=500)
     with colPreviewPlot:
         st.subheader('Preview attenuation curves')
-        plot1= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='lightblue').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase1:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()
-        plot2= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase2:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()        
-        plot3= alt.Chart(newDatabase2,width='container',height=400).mark_line(color='green').encode(
-                        x=alt.X('Energy (kV):Q').scale(domain=(10,180)),y=alt.Y('newPhase3:Q',title='Attenuation Coefficient (cm-1)').scale(type="log")).interactive()
-        plot=plot1+plot2+plot3
-        st.altair_chart(plot,use_container_width=True) 
+        with timings.section('New phases chart'):
+            st.vega_lite_chart(xct_charts.newPhasesSpec(newDatabase2,newPhases[:3]),use_container_width=True)
+allPhases=[phase for phase in database.columns if phase!='Energy (kV)']+newPhases
+########### the new phases are aligned with the rows of the database (same energies), float columns so no conversion is needed
+dfPhases=pd.concat([database,newDatabase2[newPhases].reindex(database.index)],axis=1)
 
 ############################ Controls the display in the tab Composition ################################
 with tabComposition:
     col1,col3,col4=st.columns(3,gap='large')
     with col1:
-        st.subheader('Main phases from database', help='The phases of interest are the ones that must be distinguished to answer the scientific question. Tip: if the sample has a complex matrix group the phases into classes of similar attenuation. **IMPORTANT:** newphases must match the number, e.g. newPhase1 can only be selected in Phase1, not in Phase 2 menu')
-        menuPhase1=st.selectbox(label=':blue[Phase1]',options=allPhases,index=0)
-        menuPhase2=st.selectbox(label=':green[Phase2]',options=allPhases,index=0) 
-        menuPhase3=st.selectbox(label=':orange[Phase3]',options=allPhases,index=0)
-        menuPhase4=st.selectbox(label=':red[Phase4]',options=allPhases,index=0)  
+        st.subheader('Main phases from database', help='The phases of interest are the ones that must be distinguished to answer the scientific question. Tip: if the sample has a complex matrix group the phases into classes of similar attenuation. The new phases of the Database tab can be selected like any other phase')
+        menuPhases=st.multiselect(label='Phases',options=allPhases,default=allPhases[:1],help='Select as many phases as needed, e.g. all the constituents of a rock or composite')
     with col3:
         st.subheader('Volume fractions',help='If you are an x-ray crossing the sample, how much yould you need to cross of each phase (values 0-1 and the sum of all phases should be 1-porosity)')
-        inFracPhase1= st.number_input('Phase1 Volume Fraction (0-1)', value=0.0, min_value=0.0, max_value=1.0, step=0.02)
-        inFracPhase2= st.number_input('Phase2 Volume Fraction (0-1)', value=0.0, min_value=0.0, max_value=1.0, step=0.02)
-        inFracPhase3= st.number_input('Phase3 Volume Fraction (0-1)', value=0.0, min_value=0.0, max_value=1.0, step=0.02)
-        inFracPhase4= st.number_input('Phase4 Volume Fraction (0-1)', value=0.0, min_value=0.0, max_value=1.0, step=0.02) 
-        porosity= int((1-inFracPhase1-inFracPhase2-inFracPhase3-inFracPhase4)*100)    
+        inFractions=[st.number_input(':%s[%s] Volume Fraction (0-1)'%(phaseColor(i),phase), value=0.0, min_value=0.0, max_value=1.0, step=0.02, key='fraction '+phase)
+                     for i,phase in enumerate(menuPhases)]      # keyed by phase, the value is kept when other phases are added or removed
+        porosity= int((1-sum(inFractions))*100)    
         st.write('Porosity (%):',porosity) #help='1 minus the sum of the volume fractions. Air is assumed to have attenuation coefficient =0'
     with col4:
         st.subheader('X-ray energy', 
@@ -301,15 +239,91 @@ with tabComposition:
     with col4:
         st.subheader('Total transmission',
                   help='Percent of x-rays that penetrate through the :blue[Filter (light blue)], the :green[Sample (green)] and the :orange[Sample + Filter (orange)] at various energies')
-        dfTotalTransm4Plot2 = transmission()
+        with timings.section('Transmission'):
+            dfTotalTransm4Plot2 = transmission()
         st.write(':green[Sample]  -  :blue[Filter]  -  :orange[Sample+Filter]')
         with st.expander('Transmission Table'):
             st.table(dfTotalTransm4Plot2)    
     with col5:
         st.subheader('Attenuation',
                   help='Energies with large difference between curves give better contrast. Note: if the curves are matching the phases will have similar greyvalues in the final image)')
-        attenuation_energy()
+        with timings.section('Attenuation chart'):
+            attenuation_energy()
         st.write(':grey[Each line corresponds to a phase selected with the same color]')
+    st.divider()
+    st.subheader('Polychromatic spectrum',
+                 help='Tube spectrum (Kramers law) up to the Maximum Energy, hardened by the filter and the sample. Transmission and mean energy are weighted by the detected signal (photons x energy)')
+    colSpectrumPlot,colSpectrumMetrics=st.columns([3,1],gap='large')
+    with timings.section('Spectrum'):
+        spectrum=xct_spectrum.spectrumTransmission(phaseTable(),menuPhases,inFractions,
+                                                   slideDiameter,menuFilter,filterThickness,testEmax)
+    with colSpectrumMetrics:
+        st.metric('Transmission Filter+Sample (%)',round(spectrum['transmissionTotal'],1))
+        st.metric('Mean detected energy (keV)',round(spectrum['meanEnergyDetected'],1),round(spectrum['meanEnergyDetected']-spectrum['meanEnergyIncident'],1),
+                  help='The delta is the shift relative to the unfiltered spectrum')
+        st.metric('Beam hardening (%)',round(spectrum['beamHardening'],1),
+                  help='How much lower the effective attenuation of the whole sample is compared with the attenuation seen by the beam entering it. High values cause cupping artefacts')
+    with colSpectrumPlot:
+        dfSpectrum=pd.DataFrame({'Energy (kV)':spectrum['energies'],'Tube':spectrum['incident'],'Filter':spectrum['filtered'],'Filter+Sample':spectrum['detected']})
+        st.vega_lite_chart(xct_charts.spectrumSpec(dfSpectrum),use_container_width=True)
+        st.write(':blue[Tube]  -  :orange[Filter]  -  :green[Filter+Sample]')
+    st.divider()
+    st.subheader('Sample shape',
+                 help='Transmission of every ray of a projection through the shape of the sample. The plots above assume a slab as thick as the diameter, which is the worst ray of a cylinder')
+    colShape,colShapePlot,colShapeMap=st.columns([1,2,1],gap='large')
+    with colShape:
+        menuShape=st.selectbox('Shape',options=xct_geometry.SHAPES,help='Sample diameter from the :blue[Geometric Parameters] tab')
+        inShapeHeight=st.number_input('Height in the field of view (mm)',value=max(0.1,float(slideDiameter)),min_value=0.1,step=1.0)
+        inShapeDepth,slideShapeAngle,inWallThickness,menuContainer,uploadMask=slideDiameter,0,0.0,None,None
+        if menuShape=='Box':
+            inShapeDepth=st.number_input('Depth (mm)',value=max(0.1,float(slideDiameter)),min_value=0.1,step=1.0,help='The diameter is the width of the box')
+        if menuShape=='Cylinder in tube':
+            menuContainer=st.selectbox('Container',options=allPhases,index=allPhases.index('Polystyrene') if 'Polystyrene' in allPhases else 0)
+            inWallThickness=st.number_input('Wall thickness (mm)',value=1.0,min_value=0.0,step=0.5)
+        if menuShape=='Voxel mask':
+            uploadMask=st.file_uploader(label='upload voxel mask (.npy)',help='3D array (rows, depth, columns) with 0 for air and any other value for the sample, e.g. a segmented previous scan')
+            inMaskVoxel=st.number_input('Voxel size of the mask (um)',value=max(0.1,float(st.session_state['voxelSize'])),min_value=0.1)
+        if menuShape in ('Box','Voxel mask'):
+            slideShapeAngle=st.slider('Rotation angle (deg)',value=0,min_value=0,max_value=90,step=5)
+    with timings.section('Sample shape'):
+        try:
+            paths=samplePaths(menuShape)
+        except ValueError as error:
+            st.error(error)
+            paths=None
+        if paths is not None:
+            dfGeometry=xct_geometry.geometryTransmission(phaseTable(),menuPhases,inFractions,paths,menuFilter,filterThickness)
+            dfGeometry['Slab']=dfTotalTransm4Plot2['Filter+Sample']
+            projection=xct_geometry.transmissionMap(phaseTable(),menuPhases,inFractions,paths,testEmax,menuFilter,filterThickness)
+    if paths is None:
+        colShapePlot.info('Upload a voxel mask')
+    else:
+        with colShapePlot:
+            st.vega_lite_chart(xct_charts.geometrySpec(dfGeometry),use_container_width=True)
+            st.write(':red[Worst ray]  -  :green[Mean of the rays crossing the sample]  -  :blue[Slab]')
+        with colShapeMap:
+            st.metric('Worst ray at Emax (%)',round(float(np.nanmin(projection)),1))
+            st.image(np.nan_to_num(projection/100),clamp=True,caption='Projection at Emax, white is 100% transmission')
+    st.divider()
+    st.subheader('Contrast between phases',
+                 help='Contrast: difference of the attenuation of two phases weighted by the detected spectrum. CNR: contrast x square root of the transmitted flux, a proxy of the contrast to noise ratio of the final image')
+    colPairs,colFront=st.columns([1,2],gap='large')
+    with timings.section('Contrast'):
+        dfPairs=xct_contrast.pairTable(phaseTable(),menuPhases,inFractions,slideDiameter,menuFilter,filterThickness,testEmax)
+        dfFront=xct_contrast.paretoFront(xct_contrast.contrastPlans(phaseTable(),menuPhases,inFractions,slideDiameter,
+                                                                   st.session_state['voxelSize'],radio3,radio4,scanner))
+        recommended=xct_contrast.recommendation(dfFront)
+    with colPairs:
+        if dfPairs.empty:
+            st.info('Select at least two phases')
+        else:
+            st.dataframe(dfPairs, hide_index=True)
+    with colFront:
+        if recommended is not None:
+            st.write('Recommended: :violet[%d kV], :violet[%s %.1f mm] (%.1f hrs), hardest pair %s'%(recommended['Energy (kV)'],recommended['Filter'],
+                     recommended['Filter Thickness (mm)'],recommended['Scan Time (hrs)'],recommended['Hardest pair']))
+            with st.expander('Contrast vs scan time (Pareto front)'):
+                st.dataframe(dfFront, hide_index=True)
 
 ############################ Display the sidebar ################################
 st.sidebar.title('  ') #just some space
@@ -317,37 +331,11 @@ st.sidebar.title(':violet[Contrast]',
                  help='Contrast is reflected in the grey-scale of the different phases in the final image. It can be estimated by the difference in the attenuation curves within the energies boundaries [minimum transmissible energy, Emax], see Attenuation plot in the tab :violet["Composition"]')
 st.sidebar.metric(':violet[Maximum Energy (kV)]',st.session_state['maximumEnergy'],help='Input with the slider in the tab :violet["Composition Parameter"]. Tip: 1) If contrast is not a problem, aim at high kV, 2) At Emax, the transmission should be at least 10percent ')
 st.sidebar.metric(':violet[Filter]',st.session_state['filterThickness'],menuFilter, delta_color='off' )
+if not dfPairs.empty:
+    st.sidebar.metric(':violet[Lowest contrast (cm-1)]',round(dfPairs['Contrast (cm-1)'].min(),3),
+                      help='Contrast of the pair of phases that is the hardest to tell apart at the current Maximum Energy and filter')
 ############################ Calculation of time using empirical equations ################################
-if st.session_state['voxelSize']<15:      # this is specific of the CoreTom: the power (W) equals the voxel size except bellow 15um.
-    power = 15
-else:
-    power = st.session_state['voxelSize']
-if radio3=='1x' and radio4=='1920':
-    cameraFactor=1 # this camera was used as reference
-    resolutionFactor=1
-    scanTime=round((1.38*st.session_state['filterThickness']-0.0198*st.session_state['maximumEnergy']-0.0328*power+6.048)*cameraFactor,1)
-if radio3=='2x' and radio4=='1920':
-    cameraFactor=1
-    resolutionFactor=2
-    scanTime=round((0.68*st.session_state['filterThickness']-0.0109*st.session_state['maximumEnergy']-0.0152*power+2.607)*cameraFactor,1)
-if radio3=='3x' and radio4=='1920':
-    cameraFactor=1
-    resolutionFactor=3 
-    scanTime=round((0.328*st.session_state['filterThickness']-0.0055*st.session_state['maximumEnergy']-0.0068*power+1.19)*cameraFactor,1)
-if radio3=='1x' and radio4=='2856':
-    cameraFactor=1.4875
-    resolutionFactor=1
-    scanTime=round((1.38*st.session_state['filterThickness']-0.0198*st.session_state['maximumEnergy']-0.0328*power+6.048)*cameraFactor,1)
-if radio3=='2x' and radio4=='2856':
-    cameraFactor=1.4875
-    resolutionFactor=2
-    scanTime=round((0.68*st.session_state['filterThickness']-0.0109*st.session_state['maximumEnergy']-0.0152*power+2.607)*cameraFactor,1)
-if radio3=='3x' and radio4=='2856':
-    cameraFactor=1.4875
-    resolutionFactor=3
-    scanTime=round((0.328*st.session_state['filterThickness']-0.0055*st.session_state['maximumEnergy']-0.0068*power+1.19)*cameraFactor,1)
-if scanTime<0.1:
-    scanTime=0.1
+scanTime=xct.scanTime(st.session_state['voxelSize'],radio3,radio4,st.session_state['filterThickness'],st.session_state['maximumEnergy'],scanner)
 #Unused time equation with binning as input 
 #scanTime=(0.61*st.session_state['filterThickness']-0.0109*st.session_state['maximumEnergy']-1.3*resolutionFactor-0.0148*st.session_state['voxelSize']+5.65)*cameraFactor   #Bin1+Bin2+Bin3
 
@@ -355,19 +343,9 @@ st.sidebar.title(' ') #just some space
 st.sidebar.title(':green[Time]',help='Tip: longer scans usually mean higher quality, which means less image processing time. Restric the time only if it is a time-lapse experiment or the access to the scanner is limited')
 inNumbScans= st.sidebar.number_input(':green[Number of scans]', value=1, min_value=1, max_value=100, step=1, 
                                      help='this should acount for 1) how many samples, 2) how many scans per sample, e.g if the sample height> 0.8 x diameter. :red[IMPORTANT: Only aim at as many samples as you can realistically analyse]. Rule of thumb: processing 1 scan takes at least 1 days for qualitative studies and 1 week for quantitative studies')
-experimentTime=round((scanTime+0.2)*inNumbScans,1) # adds 0.2 hrs to account for warmup?
+experimentTime=xct.experimentTime(scanTime,inNumbScans,scanner) # adds 0.2 hrs to account for warmup?
 
-if radio3=='1x' and radio4=='2856' and scanTime>6.2:
-    st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime) 
-elif radio3=='2x' and radio4=='2856' and scanTime>3.2:
-    st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime)
-elif radio3=='3x' and radio4=='2856' and scanTime>2.2:
-    st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime)
-elif radio3=='1x' and radio4=='1920' and scanTime>4.2:
-    st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime) 
-elif radio3=='2x' and radio4=='1920' and scanTime>2.2:
-    st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime)
-elif radio3=='3x' and radio4=='1920' and scanTime>1.5:
+if xct.isLongScan(scanTime,radio3,radio4,scanner):
     st.sidebar.metric(':red[Experiment Time (hrs)]',experimentTime)
 else: 
     st.sidebar.metric(':green[Experiment Time (hrs)]',experimentTime,help='It includes 12 min for every scan (to warmup and setting up the scan)') 
@@ -376,10 +354,10 @@ with tabSummary:
     buttExport=st.button(label='Export parameters')
     colParam, colComp = st.columns(2)
     if buttExport:
-        scanParameters={'Parameter':['Voxel Size (um)','Purpose', 'Binning', 'Detector size','Energy', 'Filter Material','Filter Thickness (um)','Data Size (Gb)','Expected time (hrs)'],
-                        'Value':[st.session_state['voxelSize'],radio1,radio3,radio4,st.session_state['maximumEnergy'],menuFilter,st.session_state['filterThickness'],st.session_state['DataSize'],scanTime]}
-        sampleComposition={'Sample':['Sample Diameter (mm)','Phase1','Fraction Phase1','Phase2','Fraction Phase2','Phase3','Fraction Phase3','Phase4','Fraction Phase4'],
-                        'Composition':[st.session_state['diameter'],menuPhase1,inFracPhase1,menuPhase2,inFracPhase2,menuPhase3,inFracPhase3,menuPhase4,inFracPhase4]}
+        scanParameters={'Parameter':['Scanner','Voxel Size (um)','Purpose', 'Binning', 'Detector size','Energy', 'Filter Material','Filter Thickness (um)','Data Size (Gb)','Expected time (hrs)'],
+                        'Value':[menuScanner,st.session_state['voxelSize'],radio1,radio3,radio4,st.session_state['maximumEnergy'],menuFilter,st.session_state['filterThickness'],st.session_state['DataSize'],scanTime]}
+        sampleComposition={'Sample':['Sample Diameter (mm)']+[name for i in range(1,len(menuPhases)+1) for name in ('Phase%d'%i,'Fraction Phase%d'%i)],
+                        'Composition':[st.session_state['diameter']]+[value for phaseFraction in zip(menuPhases,inFractions) for value in phaseFraction]}
         scanParameters=pd.DataFrame(scanParameters)
         sampleComposition=pd.DataFrame(sampleComposition)
 
@@ -388,4 +366,85 @@ with tabSummary:
         with colComp:
             st.dataframe(sampleComposition, width=250, hide_index=True) 
 
-        st.download_button(label='Save parameters',data=scanParameters.to_csv(),file_name='scanParameters.csv')       
+        st.download_button(label='Save parameters',data=scanParameters.to_csv(),file_name='scanParameters.csv')
+
+############################ Sweep of all the settings for a target feature ################################
+with tabSweep:
+    st.write('Evaluates every combination of binning, detector, filter, filter thickness and maximum energy for the phases of the :violet[Composition] tab and ranks the ones that resolve the target feature with at least 10% transmission at Emax, fastest first')
+    colTarget, colDiameters, colTop = st.columns(3, gap='large')
+    with colTarget:
+        inTargetFeature=st.number_input('Target Minimum Feature Size (um)', value=max(1,int(st.session_state['minimumFeature'])), min_value=1, step=1)
+    with colDiameters:
+        checkAllDiameters=st.checkbox('Sweep all diameters (1-150 mm)', value=False, help='By default only the diameter of the :blue[Geometric Parameters] tab is used')
+    with colTop:
+        inTop=st.number_input('Number of plans', value=50, min_value=1, max_value=1000, step=10)
+    if st.button(label='Run sweep'):
+        sweepDiameters=xct_sweep.SWEEP_DIAMETERS if checkAllDiameters else [slideDiameter]
+        dfSweep=xct_sweep.sweepPlans(phaseTable(),menuPhases,inFractions,
+                                     inTargetFeature,purpose=radio1,numberOfScans=inNumbScans,scanner=scanner,top=inTop,diameters=sweepDiameters)
+        if dfSweep.empty:
+            st.warning('No setting reaches the target feature with enough transmission. Consider a smaller diameter or a larger target feature')
+        else:
+            st.dataframe(dfSweep, hide_index=True)
+            st.download_button(label='Save plans',data=dfSweep.to_csv(index=False),file_name='sweepPlans.csv')
+
+############################ Batch planning of many samples from a manifest ################################
+with tabBatch:
+    st.write('Plans every sample of a csv manifest with the scanner, binning, detector, filter and Maximum Energy selected in the other tabs. Each sample has its own diameter, phases and volume fractions')
+    colManifest, colExample = st.columns([3,1])
+    with colManifest:
+        uploadManifest=st.file_uploader(label='upload sample manifest (csv)',help='Columns: Sample, Diameter (mm), Phase1, Fraction1, Phase2, Fraction2, ... and optionally Number of scans')
+    with colExample:
+        st.download_button(label='Example manifest',data=xct_batch.MANIFEST_EXAMPLE.to_csv(index=False),file_name='manifest.csv')
+    if uploadManifest:
+        barBatch=st.progress(0.0,text='Planning samples')
+        try:
+            with timings.section('Batch'):
+                dfSchedule=xct_batch.planUpload(uploadManifest.getvalue(),phaseTable(),radio3,radio4,menuFilter,filterThickness,testEmax,
+                                                purpose=radio1,scanner=scanner,progress=lambda done: barBatch.progress(done,text='Planning samples'))
+        except ValueError as error:
+            st.error(error)
+        else:
+            totals=xct_batch.scheduleTotals(dfSchedule)
+            colSamples, colHours, colData = st.columns(3)
+            colSamples.metric('Samples (scans)','%d (%d)'%(totals['samples'],totals['scans']))
+            colHours.metric(':green[Total Experiment Time (hrs)]',totals['hours'])
+            colData.metric(':blue[Total Data Size (TB)]',totals['terabytes'])
+            st.dataframe(dfSchedule, hide_index=True)
+            colCsv, colParquet = st.columns(2)
+            colCsv.download_button(label='Save schedule (csv)',data=dfSchedule.to_csv(index=False),file_name='schedule.csv')
+            colParquet.download_button(label='Save schedule (parquet)',data=xct_batch.scheduleParquet(dfSchedule),file_name='schedule.parquet')
+
+############################ Simulated slice of the sample with the current settings ################################
+with tabPreview:
+    st.write('Simulates the projections of one slice of a synthetic sample (grains of the phases of the :violet[Composition] tab with their volume fractions) with the tube spectrum, filter and photon noise, and reconstructs it with filtered back-projection. Use it to judge the contrast between phases, the noise and the beam hardening (darker centre)')
+    colPixels, colAngles, colPhotons = st.columns(3, gap='large')
+    with colPixels:
+        detectorPixels=xct.projectionPixels(radio3,radio4,scanner)
+        menuPreviewPixels=st.selectbox('Pixels across the slice',options=(256,512,detectorPixels),format_func=lambda pixels: '%d (detector width)'%pixels if pixels==detectorPixels else str(pixels),
+                                       help='At most the sample diameter divided by the voxel size. The detector width is the real resolution but takes much longer')
+    with colAngles:
+        inPreviewAngles=st.number_input('Number of projections',value=xct_preview.PREVIEW_ANGLES,min_value=30,max_value=3600,step=30)
+    with colPhotons:
+        inPhotons=st.number_input('Photons per pixel (flat field)',value=xct_preview.PHOTONS,min_value=100,step=5000,help='More photons (longer exposure) means less noise')
+    if st.button(label='Simulate slice'):
+        try:
+            with st.spinner('Simulating projections'), timings.section('Preview'):
+                preview=xct_preview.slicePreview(phaseTable(),menuPhases,inFractions,slideDiameter,st.session_state['voxelSize'],menuFilter,filterThickness,testEmax,
+                                                 pixels=menuPreviewPixels,angles=inPreviewAngles,photons=inPhotons)
+        except ValueError as error:
+            st.error(error)
+        else:
+            colPhantom, colSinogram, colSlice = st.columns(3)
+            colPhantom.image(xct_preview.displayImage(preview['phantom']),caption='Phantom (%.0f um pixels)'%preview['voxelSize'],use_column_width=True)
+            colSinogram.image(xct_preview.displayImage(preview['sinogram']),caption='Sinogram (projections x detector)',use_column_width=True)
+            colSlice.image(xct_preview.displayImage(preview['slice']),caption='Reconstructed slice',use_column_width=True)
+            colCupping, colTable = st.columns([1,3])
+            colCupping.metric('Cupping (%)',round(preview['cupping'],1),help='How much darker the centre of the sample is than its rim, caused by beam hardening')
+            colTable.dataframe(preview['phases'], hide_index=True)
+
+############################ Time of each section of this rerun, add ?timing=1 to the url ################################
+if st.query_params.get('timing'):
+    with st.sidebar.expander('Rerun timing'):
+        st.table(timings.table())
+timings.log()
@@ -0,0 +1,143 @@
+#Shape of the sample: path length of every ray of a projection through parametric shapes or a voxel mask
+#The rest of the app treats the sample as a slab as thick as the diameter, so all the rays cross the same length. Here the rays of a
+#parallel beam projection (rows x columns of pixels, along the rotation axis x across it) are cast through the shape:
+#   cylinder, sphere: analytic chords; box: slab intersection, rotated around the vertical axis; cylinder in tube: sample + container wall
+#   voxel mask: label array (rows, depth, columns), nearest voxel sampled along the rays, a few rows at a time
+#The paths are reduced to their distribution (distinct lengths and number of pixels), so the minimum and mean transmission at every
+#energy only cost one small matrix product
+import io
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_engine as xct
+
+SHAPES=('Cylinder','Sphere','Box','Cylinder in tube','Voxel mask')
+SAMPLE='Sample'          # path key of the sample itself, attenuation from the phases and volume fractions
+PIXELS=512               # projection grid of the parametric shapes
+PATH_RESOLUTION=0.001    # mm, path lengths are binned to 1 um in the distribution
+CHUNK_ROWS=4             # rows of a voxel mask cast at once, bounds the memory to ~ CHUNK_ROWS x diagonal^2 bytes
+
+################################ Projection grid ################################
+def projectionGrid(width,height,pixels=PIXELS):
+    ########### pixel centres (mm) of a square field of view containing the object: rows (pixels,1) and columns (1,pixels)
+    field=max(width,height)*1.05
+    centres=(np.arange(pixels)+0.5)*field/pixels-field/2
+    return centres[::-1].reshape(-1,1),centres.reshape(1,-1)
+
+def chord(radius,u):
+    ########### length crossed in a circle by a ray at distance u from its centre
+    return 2*np.sqrt(np.clip(radius**2-u**2,0,None))
+
+################################ Parametric shapes ################################
+def cylinderPaths(diameter,height,pixels=PIXELS):
+    ########### vertical cylinder, the same projection at every angle
+    v,u=projectionGrid(diameter,height,pixels)
+    return {SAMPLE:chord(diameter/2,u)*(np.abs(v)<=height/2)}
+
+def spherePaths(diameter,pixels=PIXELS):
+    v,u=projectionGrid(diameter,diameter,pixels)
+    return {SAMPLE:2*np.sqrt(np.clip((diameter/2)**2-u**2-v**2,0,None))}
+
+def boxPaths(width,depth,height,angle=0,pixels=PIXELS):
+    ########### box rotated by angle (degrees) around the vertical axis, at 0 the rays cross the depth
+    v,u=projectionGrid(np.hypot(width,depth),height,pixels)
+    cos,sin=np.cos(np.radians(angle)),np.sin(np.radians(angle))
+    ########### ray (u,t) in box coordinates: across = u cos + t sin, along = -u sin + t cos, each must stay inside its half size
+    low,high=np.full(u.shape,-np.inf),np.full(u.shape,np.inf)
+    for half,start,step in ((width/2,u*cos,sin),(depth/2,-u*sin,cos)):
+        if abs(step)<1e-12:
+            inside=np.abs(start)<=half
+            low,high=np.where(inside,low,np.inf),np.where(inside,high,-np.inf)
+        else:
+            first,second=(-half-start)/step,(half-start)/step
+            low,high=np.maximum(low,np.minimum(first,second)),np.minimum(high,np.maximum(first,second))
+    return {SAMPLE:np.clip(high-low,0,None)*(np.abs(v)<=height/2)}
+
+def tubePaths(diameter,height,wallThickness,container,pixels=PIXELS):
+    ########### cylinder filling a tube of the container material (e.g. a polymer or glass sample holder)
+    v,u=projectionGrid(diameter+2*wallThickness,height,pixels)
+    rows=np.abs(v)<=height/2
+    sample=chord(diameter/2,u)
+    return {SAMPLE:sample*rows,container:(chord(diameter/2+wallThickness,u)-sample)*rows}
+
+################################ Voxel mask ################################
+def rayIndices(depth,columns,angle,step=1.0):
+    ########### nearest voxel (depth, column) of every sample point of every ray (detector column, point along the ray)
+    diagonal=np.hypot(depth,columns)
+    detector=np.arange(int(np.ceil(diagonal)))-np.ceil(diagonal)/2+0.5
+    along=np.arange(0,diagonal,step)-diagonal/2+step/2
+    cos,sin=np.cos(np.radians(angle)),np.sin(np.radians(angle))
+    column=np.rint(detector[:,None]*cos+along[None,:]*sin+(columns-1)/2).astype(np.intp)
+    row=np.rint(-detector[:,None]*sin+along[None,:]*cos+(depth-1)/2).astype(np.intp)
+    inside=(column>=0)&(column<columns)&(row>=0)&(row<depth)
+    return np.where(inside,row,0),np.where(inside,column,0),inside
+
+def maskPaths(mask,voxelSize,materials=None,angle=0,chunkRows=CHUNK_ROWS):
+    ########### mask: (rows, depth, columns) labels, 0 is air, can be a memory map; voxelSize in um, the rays cross the depth at angle 0
+    ########### materials: label -> path key, by default every voxel that is not air is the sample
+    mask=np.asarray(mask) if not isinstance(mask,np.memmap) else mask
+    if mask.ndim!=3:
+        raise ValueError('the voxel mask must be a 3D array (rows, depth, columns)')
+    selectors=list(materials.items()) if materials else [(None,SAMPLE)]
+    rows,depth,columns=mask.shape
+    if angle%360:
+        row,column,inside=rayIndices(depth,columns,angle)
+        flat=np.where(inside,row*columns+column,depth*columns)      # points outside the mask read an extra air voxel
+    paths={name:np.zeros((rows,flat.shape[0] if angle%360 else columns)) for name in dict.fromkeys(name for _,name in selectors)}
+    for start in range(0,rows,chunkRows):
+        block=np.asarray(mask[start:start+chunkRows])
+        if angle%360:
+            block=np.concatenate([block.reshape(len(block),-1),np.zeros((len(block),1),block.dtype)],axis=1)
+            block,axis=np.take(block,flat,axis=1),2       # (rows, detector, points along the ray)
+        else:
+            axis=1                                        # (rows, depth, columns)
+        for label,name in selectors:
+            hits=block!=0 if label is None else block==label
+            paths[name][start:start+chunkRows]+=hits.sum(axis=axis,dtype=np.int32)*voxelSize/1000
+    return paths
+
+def readMask(data):
+    ########### .npy file (bytes) of a 3D label array, no pickled objects
+    mask=np.load(io.BytesIO(data),allow_pickle=False)
+    if mask.ndim!=3 or not (np.issubdtype(mask.dtype,np.integer) or mask.dtype==bool):
+        raise ValueError('the voxel mask must be a 3D array of integer labels or booleans, not %dD %s'%(mask.ndim,mask.dtype))
+    return mask
+
+################################ Transmission ################################
+def pathDistribution(paths,resolution=PATH_RESOLUTION):
+    ########### distinct combinations of path lengths (mm, one column per path key) and their number of pixels, air pixels left out
+    names=list(paths)
+    bins=np.stack([np.rint(np.ravel(paths[name])/resolution).astype(np.int64) for name in names],axis=1)
+    bins=bins[bins.any(axis=1)]
+    shape=tuple(bins.max(axis=0,initial=0)+1)
+    if np.prod(np.array(shape,dtype=float))<2**62:
+        ########### one integer per combination, much faster to sort than rows
+        keys,counts=np.unique(np.ravel_multi_index(tuple(bins.T),shape),return_counts=True)
+        lengths=np.stack(np.unravel_index(keys,shape),axis=1).reshape(len(keys),len(names))
+    else:
+        lengths,counts=np.unique(bins,axis=0,return_counts=True)
+    return names,lengths*resolution,counts
+
+def pathAttenuation(database,phases,fractions,names,energies=None):
+    ########### (energies x path keys) attenuation coefficients (cm-1), at the energies of the table by default
+    if energies is None:
+        return np.stack([xct.sampleAttenuation(database,phases,fractions) if name==SAMPLE else database[name].to_numpy(dtype=float)
+                         for name in names],axis=1).reshape(len(database),len(names))
+    energies=np.atleast_1d(np.asarray(energies,dtype=float))
+    return np.stack([np.asarray(fractions,dtype=float)@np.array([xct.attenuationAt(database,phase,energies) for phase in phases]).reshape(len(phases),len(energies))
+                     if name==SAMPLE else xct.attenuationAt(database,name,energies) for name in names],axis=1).reshape(len(energies),len(names))
+
+def geometryTransmission(database,phases,fractions,paths,filterMaterial,filterThickness,resolution=PATH_RESOLUTION):
+    ########### minimum (worst ray) and mean transmission (%) through filter and sample at every energy of the database
+    names,lengths,counts=pathDistribution(paths,resolution)
+    transmission=np.exp(-(pathAttenuation(database,phases,fractions,names)@lengths.T)/10)       # (energies x distinct paths)
+    transmFilter=np.exp(-database[filterMaterial].to_numpy(dtype=float)*filterThickness/10)*100
+    return pd.DataFrame({'Energy (kV)':database['Energy (kV)'].to_numpy(dtype=float),
+                         'Minimum':transmission.min(axis=1,initial=1)*transmFilter,
+                         'Mean':(transmission@counts/counts.sum() if counts.size else 1)*transmFilter})
+
+def transmissionMap(database,phases,fractions,paths,energy,filterMaterial,filterThickness):
+    ########### projection image (%) at one energy, e.g. the Maximum Energy
+    names=list(paths)
+    mu=pathAttenuation(database,phases,fractions,names,energy)[0]
+    image=np.exp(-sum(mu[i]*paths[name] for i,name in enumerate(names))/10)
+    return image*np.exp(-xct.attenuationAt(database,filterMaterial,energy)*filterThickness/10)*100
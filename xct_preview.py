@@ -0,0 +1,191 @@
+#Preview of one reconstructed slice: synthetic phantom -> polychromatic projections -> filtered back-projection
+#The phantom is a disc of the sample diameter with grains of the selected phases drawn with the volume fractions (the rest is pores),
+#sampled at the voxel size. Every ray is attenuated energy by energy through the filter and the phases it crosses and the detected
+#signal gets photon noise, so the slice shows the expected contrast, noise and beam hardening (cupping, streaks)
+#Angles are projected in chunks, optionally over a process pool, and inside every angle the rays (or the rows of the slice) are
+#cast in blocks of BLOCK_POINTS points. The reconstruction splits the angles in one contiguous group per worker and every worker
+#filters and back-projects its group CHUNK_ANGLES at a time into a single slice, so besides the sinogram (angles x pixels) the
+#memory is a few tens of Mb plus one slice per worker whatever the number of pixels and angles. The results of identical
+#parameters are kept in a cache
+import concurrent.futures
+import os
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_spectrum
+
+PREVIEW_PIXELS=256       # pixels across the field of view of the preview, the full detector width can be asked for
+PREVIEW_ANGLES=180       # projections over 180 degrees (parallel beam)
+PREVIEW_STEP=2.0         # keV, energy step of the polychromatic projections
+PHOTONS=20000            # photons per detector pixel and projection of the flat field
+GRAINS=48                # grains across the sample diameter
+CHUNK_ANGLES=8
+BLOCK_POINTS=2**20       # sample points of the rays cast at once (~40 Mb of temporaries)
+PARALLEL_PIXELS=1024     # larger slices are split over a process pool
+MAX_WORKERS=4            # default size of the pool, every worker holds one slice
+PREVIEW_CACHE={}         # parameters -> preview
+CACHE_SIZE=4
+
+################################ Phantom ################################
+def phantom(pixels,fractions,grains=GRAINS,seed=0):
+    ########### labels (pixels x pixels): 0 air and pores, i+1 phase i; square grains drawn with probabilities = volume fractions
+    rng=np.random.default_rng(seed)
+    fractions=np.clip(np.asarray(fractions,dtype=float),0,None)
+    probabilities=np.append(max(0.0,1-fractions.sum()),fractions)
+    probabilities=probabilities/probabilities.sum()
+    cells=int(np.ceil(pixels/max(1,pixels*0.95/grains)))
+    grid=rng.choice(len(probabilities),size=(cells,cells),p=probabilities).astype(np.uint8)
+    labels=np.repeat(np.repeat(grid,-(-pixels//cells),axis=0),-(-pixels//cells),axis=1)[:pixels,:pixels]
+    centre=(pixels-1)/2
+    rows,columns=np.ogrid[:pixels,:pixels]
+    labels[(rows-centre)**2+(columns-centre)**2>(pixels*0.95/2)**2]=0        # the disc fills 95% of the field of view
+    return labels
+
+################################ Projections ################################
+def rayGrid(pixels):
+    ########### detector coordinate and position along the ray (pixels from the centre), same rays as xct_geometry.rayIndices
+    ########### the sample is inside the inscribed disc of the slice, so the rays are only sampled across its diameter
+    samples=pixels
+    return (np.arange(pixels,dtype=np.float32)-(pixels-1)/2)[:,None],(np.arange(samples,dtype=np.float32)-(samples-1)/2)[None,:]
+
+def projectChunk(labels,angles,mu,signal,photons,pixelSize,seed,blockPoints=BLOCK_POINTS):
+    ########### detected signal -log(I/I0) of the rays of every angle of the chunk, mu: (labels x energies) cm-1, pixelSize cm
+    pixels=labels.shape[0]
+    phases=mu.shape[0]
+    flat=np.append(labels.ravel(),np.zeros(1,labels.dtype))          # points outside the slice read an extra air pixel
+    detector,along=rayGrid(pixels)
+    centre=(pixels-1)/2
+    block=max(1,blockPoints//along.shape[1])          # detector pixels cast at once
+    sinogram=np.empty((len(angles),pixels),dtype=np.float32)
+    rng=np.random.default_rng(seed)
+    for i,angle in enumerate(angles):
+        cos,sin=np.cos(angle),np.sin(angle)
+        ########### path length (cm) of every ray in every label, then the signal of every energy
+        lengths=np.empty((pixels,phases))
+        for start in range(0,pixels,block):
+            rays=detector[start:start+block]
+            column=np.rint(rays*cos+along*sin+centre).astype(np.intp)
+            row=np.rint(-rays*sin+along*cos+centre).astype(np.intp)
+            inside=(column>=0)&(column<pixels)&(row>=0)&(row<pixels)
+            crossed=flat[np.where(inside,row*pixels+column,pixels*pixels)]+np.arange(len(rays))[:,None]*phases
+            lengths[start:start+block]=np.bincount(crossed.ravel(),minlength=len(rays)*phases).reshape(len(rays),phases)
+        lengths*=pixelSize
+        transmission=np.exp(-lengths@mu)@signal/signal.sum()
+        noisy=transmission*(1+rng.standard_normal(pixels)/np.sqrt(np.maximum(photons*transmission,1)))
+        sinogram[i]=-np.log(np.clip(noisy,1e-6,None))
+    return sinogram
+
+################################ Reconstruction ################################
+def rampFilter(sinogram):
+    ########### ramp filter (built in real space so the mean is kept) with a Hann window, zero padded to avoid wrap around
+    pixels=sinogram.shape[1]
+    padded=int(2**np.ceil(np.log2(2*pixels)))
+    n=np.concatenate([np.arange(padded//2+1),np.arange(padded//2-1,0,-1)])
+    kernel=np.where(n%2==1,-1/(np.pi*np.maximum(n,1))**2,0.0)
+    kernel[0]=0.25
+    window=np.fft.rfft(kernel).real*(1+np.cos(2*np.pi*np.fft.rfftfreq(padded)))/2
+    return np.fft.irfft(np.fft.rfft(sinogram,n=padded,axis=1)*window,n=padded,axis=1)[:,:pixels].astype(np.float32)
+
+def backprojectChunk(filtered,angles,blockPoints=BLOCK_POINTS,image=None):
+    ########### sum of the filtered projections of the chunk smeared back along their rays, linear interpolation on the detector
+    ########### added to image if given
+    pixels=filtered.shape[1]
+    centre=(pixels-1)/2
+    x=(np.arange(pixels,dtype=np.float32)-centre)[None,:]
+    y=(np.arange(pixels,dtype=np.float32)-centre)[:,None]
+    if image is None:
+        image=np.zeros((pixels,pixels),dtype=np.float32)
+    block=max(1,blockPoints//pixels)          # rows of the slice at once
+    for start in range(0,pixels,block):
+        for projection,angle in zip(filtered,angles):
+            position=x*np.float32(np.cos(angle))-y[start:start+block]*np.float32(np.sin(angle))+centre
+            left=np.clip(np.floor(position).astype(np.intp),0,pixels-2)
+            weight=np.clip(position-left,0,1)
+            image[start:start+block]+=projection[left]*(1-weight)+projection[left+1]*weight
+    return image
+
+def reconstructChunks(sinogram,angles,blockPoints=BLOCK_POINTS):
+    ########### unscaled filtered back-projection of a group of angles, filtered and back-projected CHUNK_ANGLES at a time into one slice
+    image=np.zeros((sinogram.shape[1],)*2,dtype=np.float32)
+    for start in range(0,len(angles),CHUNK_ANGLES):
+        backprojectChunk(rampFilter(sinogram[start:start+CHUNK_ANGLES]),angles[start:start+CHUNK_ANGLES],blockPoints,image)
+    return image
+
+def mapChunks(function,chunks,workers):
+    ########### chunks: list of argument tuples, in a process pool if workers>1
+    if workers and workers>1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return [future.result() for future in [pool.submit(function,*chunk) for chunk in chunks]]
+    return [function(*chunk) for chunk in chunks]
+
+################################ Preview ################################
+def previewKey(database,phases,fractions,*parameters):
+    return (tuple(xct_spectrum.columnKey(database,phase) for phase in phases),tuple(float(fraction) for fraction in fractions))+parameters
+
+def slicePreview(database,phases,fractions,diameter,voxelSize,filterMaterial,filterThickness,maximumEnergy,
+                 pixels=PREVIEW_PIXELS,angles=PREVIEW_ANGLES,photons=PHOTONS,workers=None,seed=0):
+    ########### dict with the phantom labels, the sinogram, the reconstructed slice (cm-1) and statistics of every phase in the slice
+    ########### the voxel size (um) is coarsened if the sample does not fit in the pixels of the preview
+    if not (np.isfinite(diameter) and diameter>0):
+        raise ValueError('the sample diameter must be larger than 0 mm')
+    if not (np.isfinite(voxelSize) and voxelSize>0):
+        raise ValueError('the voxel size must be larger than 0 um')
+    pixels=int(min(pixels,np.ceil(diameter*1000/voxelSize/0.95)))
+    pixels=max(pixels,16)
+    key=previewKey(database,phases,fractions,diameter,voxelSize,filterMaterial,filterThickness,maximumEnergy,pixels,angles,photons,seed)
+    if key in PREVIEW_CACHE:
+        return PREVIEW_CACHE[key]
+    pixelSize=diameter/10/(pixels*0.95)          # cm
+    energies,muFilter=xct_spectrum.fineAttenuation(database,filterMaterial,PREVIEW_STEP)
+    signal=xct_spectrum.tubeSpectrum(energies,maximumEnergy)*energies*np.exp(-muFilter*filterThickness/10)     # photons x energy behind the filter
+    keep=signal>0
+    if not keep.any():
+        raise ValueError('no x-rays: the Maximum Energy is below the energies of the database')
+    ########### one row per label, air and phases that are not drawn in the phantom do not attenuate
+    mu=np.vstack([np.zeros(len(energies))]+[xct_spectrum.fineAttenuation(database,phase,PREVIEW_STEP)[1] if fraction>0 else np.zeros(len(energies))
+                                           for phase,fraction in zip(phases,fractions)])
+    labels=phantom(pixels,fractions,seed=seed)
+    theta=np.linspace(0,np.pi,angles,endpoint=False)
+    chunks=[slice(start,start+CHUNK_ANGLES) for start in range(0,angles,CHUNK_ANGLES)]
+    if workers is None:
+        workers=min(os.cpu_count() or 1,MAX_WORKERS) if pixels>PARALLEL_PIXELS else 1
+    sinogram=np.vstack(mapChunks(projectChunk,[(labels,theta[chunk],mu[:,keep],signal[keep],photons,pixelSize,(seed,number))
+                                               for number,chunk in enumerate(chunks)],workers))
+    ########### one contiguous group of angles per worker, so at most one partial slice per worker is kept
+    bounds=np.linspace(0,angles,max(1,min(workers,angles))+1).round().astype(int)
+    groups=[slice(start,stop) for start,stop in zip(bounds[:-1],bounds[1:])]
+    image=sum(mapChunks(reconstructChunks,[(sinogram[group],theta[group]) for group in groups],workers))*np.pi/angles/pixelSize
+    rows,columns=np.ogrid[:pixels,:pixels]
+    image[np.hypot(rows-(pixels-1)/2,columns-(pixels-1)/2)>pixels/2]=0        # outside the field of view of the detector
+    ########### mean and noise of every phase away from its grain boundaries (the 4 neighbours have the same label)
+    interior=np.zeros_like(labels,dtype=bool)
+    interior[1:-1,1:-1]=((labels[1:-1,1:-1]==labels[:-2,1:-1])&(labels[1:-1,1:-1]==labels[2:,1:-1])&
+                         (labels[1:-1,1:-1]==labels[1:-1,:-2])&(labels[1:-1,1:-1]==labels[1:-1,2:]))
+    rows=[]
+    for label,phase in enumerate(phases,1):
+        values=image[interior&(labels==label)]
+        expected=float((mu[label]*signal).sum()/signal.sum()) if signal.sum()>0 else np.nan
+        rows.append({'Phase':phase,'Without hardening (cm-1)':expected,'Reconstructed (cm-1)':float(values.mean()) if values.size else np.nan,
+                     'Noise (cm-1)':float(values.std()) if values.size else np.nan})
+    preview={'phantom':labels,'sinogram':sinogram,'slice':image,'voxelSize':pixelSize*1e4,'phases':pd.DataFrame(rows),
+             'cupping':cupping(image,labels)}
+    if len(PREVIEW_CACHE)>=CACHE_SIZE:
+        PREVIEW_CACHE.pop(next(iter(PREVIEW_CACHE)))
+    PREVIEW_CACHE[key]=preview
+    return preview
+
+def cupping(image,labels):
+    ########### beam hardening: drop (%) of the reconstructed value of the sample in the centre compared with its rim
+    pixels=labels.shape[0]
+    centre=(pixels-1)/2
+    rows,columns=np.ogrid[:pixels,:pixels]
+    radius=np.hypot(rows-centre,columns-centre)/(pixels*0.95/2)
+    solid=labels>0
+    inner,rim=image[solid&(radius<0.3)],image[solid&(radius>0.7)&(radius<0.9)]
+    if not inner.size or not rim.size or rim.mean()<=0:
+        return np.nan
+    return float((1-inner.mean()/rim.mean())*100)
+
+def displayImage(image):
+    ########### grey values 0-1 between the 1st and 99th percentiles, for st.image
+    low,high=np.nanpercentile(image,[1,99])
+    return np.clip((image-low)/(high-low),0,1) if high>low else np.zeros_like(image)
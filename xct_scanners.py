@@ -0,0 +1,67 @@
+#Registry of scanner profiles: one declarative toml file per instrument in scanners/
+#At load time every profile is compiled into a lookup table keyed by (binning, detector) with all the values that depend on the
+#detector setting, so the app reads them with one dict lookup, and into [binning,detector] arrays for the vectorized equations
+import collections
+import dataclasses
+import glob
+import os
+try:
+    import tomllib            # python >= 3.11
+except ModuleNotFoundError:
+    import tomli as tomllib   # same api, see requirements.txt
+import numpy as np            # <2
+import xct_calibration
+
+SCANNER_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)),'scanners')
+DEFAULT_SCANNER='CoreTOM'
+
+#everything that depends on the binning x detector setting
+Setting=collections.namedtuple('Setting',['vsSlope','vsIntercept','dataSize','timeCoefficients','cameraFactor','redTime','pixels'])
+
+@dataclasses.dataclass
+class Scanner:
+    name: str
+    description: str
+    binnings: tuple
+    detectors: tuple
+    defaultBinning: str
+    defaultDetector: str
+    minimumPower: float
+    minimumScanTime: float
+    setupTime: float
+    calibration: xct_calibration.Calibration
+    table: dict          # (binning, detector) -> Setting
+    arrays: dict         # Setting field -> array indexed [binning,detector] in the order of binnings and detectors
+
+def compileProfile(profile,calibration):
+    binnings,detectors=tuple(profile['binnings']),tuple(profile['detectors'])
+    table={}
+    for binning in binnings:
+        for detector in detectors:
+            b,d=calibration.binnings.index(binning),calibration.detectors.index(detector)
+            table[(binning,detector)]=Setting(vsSlope=float(calibration.vsSlope[b,d]),vsIntercept=float(calibration.vsIntercept[b,d]),
+                                              dataSize=profile['dataSize'][binning][detector],
+                                              timeCoefficients=tuple(calibration.timeCoefficients[b].tolist()),
+                                              cameraFactor=float(calibration.cameraFactor[d]),redTime=profile['redTime'][binning][detector],
+                                              pixels=profile['detectorPixels'][detector]//profile['binningFactors'][binning])
+    arrays={field:np.array([[getattr(table[(binning,detector)],field) for detector in detectors] for binning in binnings],dtype=float)
+            for field in Setting._fields}
+    return Scanner(name=profile['name'],description=profile.get('description',''),binnings=binnings,detectors=detectors,
+                   defaultBinning=profile.get('defaultBinning',binnings[0]),defaultDetector=profile.get('defaultDetector',detectors[0]),
+                   minimumPower=profile['minimumPower'],minimumScanTime=profile['minimumScanTime'],setupTime=profile['setupTime'],
+                   calibration=calibration,table=table,arrays=arrays)
+
+def loadProfile(path):
+    with open(path,'rb') as file:
+        profile=tomllib.load(file)
+    folder=os.path.dirname(os.path.abspath(path))
+    calibration=xct_calibration.loadCalibration(os.path.join(folder,profile['voxelSizeCalibration']),os.path.join(folder,profile['timeCalibration']))
+    return compileProfile(profile,calibration)
+
+def loadScanners(scannerDir=SCANNER_DIR):
+    ########### name -> compiled scanner, for every profile of the folder
+    scanners={}
+    for path in sorted(glob.glob(os.path.join(scannerDir,'*.toml'))):
+        scanner=loadProfile(path)
+        scanners[scanner.name]=scanner
+    return scanners
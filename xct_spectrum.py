@@ -0,0 +1,73 @@
+#Polychromatic model of the x-ray beam: tube spectrum up to the Maximum Energy, filter, sample and detector on a fine energy grid
+#The attenuation of each phase is interpolated log-log from the database energies onto the fine grid once and kept in a cache,
+#so moving the sliders only costs a few vector multiplications
+import hashlib
+import numpy as np            # <2
+
+ENERGY='Energy (kV)'
+ENERGY_STEP=0.5          # keV
+ATTENUATION_CACHE={}     # (phase, hash of the database column, step) -> (fine energy grid, mu)
+CACHE_SIZE=256           # columns kept, a few kb each; every edit of the new phases adds entries
+
+################################ Attenuation on the fine grid ################################
+def fineGrid(energyTable,step=ENERGY_STEP):
+    ########### fine grid covering the energies of the database
+    return np.arange(np.ceil(energyTable.min()/step)*step,energyTable.max()+step/2,step)
+
+def logInterpolation(energies,energyTable,mu):
+    ########### attenuation coefficients are close to straight lines in log-log scale between absorption edges
+    return np.exp(np.interp(np.log(energies),np.log(energyTable),np.log(np.maximum(mu,1e-12))))
+
+def columnKey(database,phase):
+    ########### identifies the data of a phase, the same name can hold other values (e.g. the new phases)
+    return phase,hashlib.sha1(database[ENERGY].to_numpy(dtype=float).tobytes()+database[phase].to_numpy(dtype=float).tobytes()).hexdigest()
+
+def fineAttenuation(database,phase,step=ENERGY_STEP):
+    key=columnKey(database,phase)+(step,)
+    if key not in ATTENUATION_CACHE:
+        energyTable=database[ENERGY].to_numpy(dtype=float)
+        mu=database[phase].to_numpy(dtype=float)
+        order=np.argsort(energyTable)
+        energies=fineGrid(energyTable,step)
+        if len(ATTENUATION_CACHE)>=CACHE_SIZE:
+            ATTENUATION_CACHE.pop(next(iter(ATTENUATION_CACHE)))      # oldest entry first
+        ATTENUATION_CACHE[key]=(energies,logInterpolation(energies,energyTable[order],mu[order]))
+    return ATTENUATION_CACHE[key]
+
+def sampleAttenuation(database,phases,fractions,step=ENERGY_STEP):
+    ########### fractions . (phases x fine energies), phases with no volume fraction are skipped (e.g. empty new phases)
+    selected=[(phase,fraction) for phase,fraction in zip(phases,fractions) if fraction>0]
+    if not selected:
+        return 0.0
+    return np.array([fraction for _,fraction in selected])@np.stack([fineAttenuation(database,phase,step)[1] for phase,_ in selected])
+
+################################ Spectrum ################################
+def tubeSpectrum(energies,maximumEnergy):
+    ########### Kramers' law, number of photons per energy bin of a tungsten target, normalized to 1
+    photons=np.clip(maximumEnergy-energies,0,None)/energies
+    total=photons.sum()
+    return photons/total if total>0 else photons
+
+def spectrumWeighted(values,weights):
+    total=weights.sum()
+    return float((values*weights).sum()/total) if total>0 else np.nan
+
+def spectrumTransmission(database,phases,fractions,diameter,filterMaterial,filterThickness,maximumEnergy,step=ENERGY_STEP):
+    ########### transmission (%) and mean energies (keV) seen by an energy integrating detector (signal ~ photons x energy)
+    energies,muFilter=fineAttenuation(database,filterMaterial,step)
+    muSample=sampleAttenuation(database,phases,fractions,step)
+    incident=tubeSpectrum(energies,maximumEnergy)*energies
+    filtered=incident*np.exp(-muFilter*filterThickness/10)
+    detected=filtered*np.exp(-muSample*diameter/10)
+    transmissionSample=spectrumWeighted(np.exp(-muSample*diameter/10),filtered)
+    ########### beam hardening: the effective attenuation of the full sample is lower than the one seen by the beam entering it
+    muEntrance=spectrumWeighted(muSample,filtered)
+    muEffective=-np.log(transmissionSample)/(diameter/10) if diameter>0 and transmissionSample>0 else muEntrance
+    return {'energies':energies,'incident':incident,'filtered':filtered,'detected':detected,
+            'transmissionFilter':spectrumWeighted(np.exp(-muFilter*filterThickness/10),incident)*100,
+            'transmissionSample':transmissionSample*100,
+            'transmissionTotal':detected.sum()/incident.sum()*100 if incident.sum()>0 else np.nan,
+            'meanEnergyIncident':spectrumWeighted(energies,incident),
+            'meanEnergyFiltered':spectrumWeighted(energies,filtered),
+            'meanEnergyDetected':spectrumWeighted(energies,detected),
+            'beamHardening':(1-muEffective/muEntrance)*100 if muEntrance>0 else 0.0}
@@ -0,0 +1,55 @@
+#Sweep of all the scan settings of the app in one shot: diameter x binning x detector x filter x filter thickness x maximum energy
+#Every equation of xct_engine broadcasts, so the full grid (~4 million plans) is evaluated as numpy arrays without loops over settings
+import numpy as np            # <2
+import pandas as pd            # 1.5.3
+import xct_engine as xct
+
+########### default grid, same values as the sliders and radio buttons of the app
+SWEEP_DIAMETERS=np.arange(1,151)                      # mm
+SWEEP_THICKNESSES=np.round(np.arange(0,26)*0.1,1)     # mm, 0-2.5
+SWEEP_ENERGIES=np.arange(0,181,5)                     # kV
+MIN_TRANSMISSION=10                                   # %, at Emax the transmission through sample+filter should be at least 10 percent
+
+def sweepGrid(database,phases,fractions,purpose='Qualitative',numberOfScans=1,scanner=xct.SCANNER,diameters=SWEEP_DIAMETERS,filters=xct.FILTERS,
+              thicknesses=SWEEP_THICKNESSES,energies=SWEEP_ENERGIES):
+    ########### returns a dict of arrays broadcastable to the shape (diameter, binning, detector, filter, thickness, energy)
+    diameters=np.asarray(diameters,dtype=float).reshape(-1,1,1,1,1,1)
+    binnings=np.arange(len(scanner.binnings)).reshape(1,-1,1,1,1,1)
+    detectors=np.arange(len(scanner.detectors)).reshape(1,1,-1,1,1,1)
+    thicknesses=np.asarray(thicknesses,dtype=float).reshape(1,1,1,1,-1,1)
+    energies=np.asarray(energies,dtype=float).reshape(1,1,1,1,1,-1)
+
+    voxel=xct.voxelSize(diameters,binnings,detectors,scanner)
+    time=xct.scanTime(voxel,binnings,detectors,thicknesses,energies,scanner)
+    ########### transmission at Emax, one filter at a time along the filter axis
+    transmission=np.concatenate([xct.transmissionAt(database,phases,fractions,diameters,material,thicknesses,energies) for material in filters],axis=3)
+    return {'Diameter (mm)':diameters,'Binning':binnings,'Detector':detectors,'Filter':np.arange(len(filters)).reshape(1,1,1,-1,1,1),
+            'Filter Thickness (mm)':thicknesses,'Energy (kV)':energies,
+            'Voxel Size (um)':voxel,'Minimum Feature (um)':xct.minimumFeature(voxel,purpose),'Transmission (%)':transmission,
+            'Scan Time (hrs)':time,'Experiment Time (hrs)':xct.experimentTime(time,numberOfScans,scanner),
+            'Data Size (Gb)':xct.dataSize(binnings,detectors,scanner)}
+
+def sweepPlans(database,phases,fractions,targetFeature,purpose='Qualitative',numberOfScans=1,scanner=xct.SCANNER,minTransmission=MIN_TRANSMISSION,top=50,**grid):
+    ########### ranked table of the settings that resolve the target feature with enough transmission, fastest first
+    ########### grid keywords (diameters, filters, thicknesses, energies) restrict the sweep, e.g. diameters=[20] for a known sample
+    filters=grid.get('filters',xct.FILTERS)
+    arrays=sweepGrid(database,phases,fractions,purpose,numberOfScans,scanner,**grid)
+    shape=np.broadcast_shapes(*(value.shape for value in arrays.values()))
+    feasible=((arrays['Minimum Feature (um)']<=targetFeature)&(arrays['Voxel Size (um)']>=1)
+              &(arrays['Transmission (%)']>=minTransmission))            # nan transmission (energy outside the table) is never feasible
+    coordinates=np.unravel_index(np.flatnonzero(np.broadcast_to(feasible,shape)),shape)
+    ########### rank by experiment time, then by the smaller minimum feature
+    order=np.lexsort((pickValues(arrays['Minimum Feature (um)'],coordinates),pickValues(arrays['Experiment Time (hrs)'],coordinates)))
+    if top is not None:
+        order=order[:top]
+    coordinates=tuple(axis[order] for axis in coordinates)
+    table=pd.DataFrame({name:pickValues(value,coordinates) for name,value in arrays.items()})
+    table['Binning']=np.asarray(scanner.binnings)[table['Binning']]
+    table['Detector']=np.asarray(scanner.detectors)[table['Detector']]
+    table['Filter']=np.asarray(filters)[table['Filter']]
+    return table
+
+def pickValues(value,coordinates):
+    ########### values of a broadcastable array at the grid coordinates, without expanding it to the full grid
+    value=np.asarray(value)
+    return value[tuple(axis if size>1 else 0 for axis,size in zip(coordinates,value.shape))]
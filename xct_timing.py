@@ -0,0 +1,37 @@
+#Wall time of the sections of one rerun of the app, shown in the sidebar with ?timing=1 in the url
+#Set XCT_TIMING_LOG=path to append the times of every rerun to a local file, one json line per rerun (read it with pd.read_json(path,lines=True))
+import contextlib
+import datetime
+import json
+import os
+import time
+import pandas as pd            # 1.5.3
+
+TIMING_LOG=os.environ.get('XCT_TIMING_LOG')
+
+class Timings:
+    def __init__(self):
+        self.start=time.perf_counter()
+        self.sections={}
+
+    @contextlib.contextmanager
+    def section(self,name):
+        start=time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name]=self.sections.get(name,0)+time.perf_counter()-start
+
+    def table(self):
+        ########### time per section in ms, the total includes everything that is not in a section
+        sections=dict(self.sections,Total=time.perf_counter()-self.start)
+        return pd.DataFrame({'Section':list(sections),'Time (ms)':[round(value*1000,1) for value in sections.values()]})
+
+    def log(self,path=TIMING_LOG):
+        ########### sections and total in ms, does nothing if no log file is set
+        if not path:
+            return
+        record={'time':datetime.datetime.now().isoformat(timespec='milliseconds'),
+                **{name:round(value*1000,2) for name,value in self.sections.items()},'Total':round((time.perf_counter()-self.start)*1000,2)}
+        with open(path,'a') as file:
+            file.write(json.dumps(record)+'\n')